@@ -1,116 +1,182 @@
-from flask import Flask, request
-from badapi.reader import BAData, BACharacter
-from badapi.localization import Localization
+from flask import Flask
+from badapi.cache import ResponseCache, SingleFlight
 from badapi.encoder import NumpyEncoder
-from badapi.helper import to_possible_types
+from badapi.routes import bp
 import json
+import logging
+import threading
+import time
+from pathlib import Path
 
-app = Flask(__name__)
-app.config['JSON_SORT_KEYS'] = False
-app.json_encoder = NumpyEncoder
-
-with open('config.json') as f:
-    configs = json.load(f)
-
-bad = BAData(configs['root_jp'], configs['root_global'])
-
-@app.route('/')
-def index():
-    return 'You are on the index page. Shoo.'
-
-@app.route('/characters/phonebook')
-def list_characters():
-    
-    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
-    contains = request.args.get('name_contains', '')
-    lang = Localization(*request.args.getlist('lang'))
-    
-    return bad.list_characters(substr=contains, student_only=stonly, lang=lang)
-
-@app.route('/characters/')
-@app.route('/characters/<int:idee>/')
-@app.route('/characters/<int:idee>/<string:resource>')
-def fetch_characters(idee=None, resource=None):
-    
-    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
-    lang = Localization(*request.args.getlist('lang'))
-    
-    # get lookup keys
-    lkey = []
-    lvalue = []
-    
-    if idee is None:
-        pass
-    else:
-        lkey.append('CharacterId')
-        lvalue.append([idee])
-        stonly = False
-        
-    for arg, val in request.args.lists():
-        if arg in ['lang', 'student_only']:
-            continue
-        lkey.append(arg)
-        lvalue.append(list(map(to_possible_types, val)))
-        
-    # find characters based on lookup keys
-    characters = bad.find_character(lkey, lvalue, student_only=stonly)
-    data = {}
-    for c_id in characters:
-        character = BACharacter(bad, c_id, lang=lang)
-
-        resource_funcs = {
-            'info': character.basic_info,
-            'stats': character.stats,
-            'details': character.details,
-            'profile': character.profile,
-            'skills': character.skills,
-            'skill_details': character.skill_details,
-            'weapon': character.weapon,
-            'weapon_passive': character.weapon_passive,
-            'bond': character.bond
-        }
-    
-        if resource is None:
-            data[c_id] = character.summary()
-        elif resource in resource_funcs.keys():
-            data[c_id] = (resource_funcs[resource])()
-        else:
-            continue
-            
-    return data
-    
-@app.route('/assets/<string:resource>/')
-@app.route('/assets/<string:resource>/<int:idee>')
-def fetch_resource(resource=None, idee=None):
-    
-    lang = Localization(*request.args.getlist('lang'))
-    
-    resource_funcs = {
-        'skills': bad.get_skill,
-        'items': bad.get_item,
-        'equipment': bad.get_equipment,
-        'currencies': bad.get_currency,
-        'furnitures': bad.get_furniture,
-        'recipes': bad.get_recipe
-    }
-    
-    lkey = []
-    lvalue = []
-    
-    if idee is None:
-        pass
-    else:
-        lkey.append('Id')
-        lvalue.append([idee])
-        
-    for arg, val in request.args.lists():
-        if arg=='lang':
-            continue
-        lkey.append(arg)
-        lvalue.append(list(map(to_possible_types, val)))
-        
-    return (resource_funcs[resource])(lookup_key=lkey, lookup_value=lvalue, lang=lang)
+logger = logging.getLogger(__name__)
+
+
+class DataState:
+    def __init__(self, config, name='default'):
+        """ Holds the data of one dataset served by an app, which is loaded in the background
+
+        :param config: the dataset configuration, see config.json
+        :param name: name of the dataset
+        """
+        self.config = config
+        self.name = name
+        self.data = None
+        self.change_history = None
+        self.error = None
+        # number of load attempts so far
+        self.attempts = 0
+        # set once loading is over, when it worked or every attempt failed
+        self._finished = threading.Event()
+        # serialised and precompressed full dumps
+        self.response_cache = ResponseCache(config.get('response_cache_bytes', 256 * 1024 * 1024))
+        # identical requests in flight at the same time share one build
+        self.single_flight = SingleFlight()
+
+    def load(self, pool=None):
+        """Makes one attempt at creating the BAData instance and loading its source tables, then marks the dataset as ready
+
+        :param pool: SharedPool of derived tables shared with the other datasets
+        :return bool: whether the data is loaded
+        """
+        self.attempts += 1
+        try:
+            # pandas is only imported here, so importing the package and creating the app stay fast
+            from badapi.reader import BAData
+            from badapi.changes import ChangeHistory
+
+            data = BAData(self.config['root_jp'], self.config['root_global'],
+                          snapshot_dir=self.config.get('snapshot_dir'), max_table_bytes=self.config.get('table_memory_bytes'),
+                          from_snapshot=self.config.get('load_from_snapshot', False), serving_model=self.config.get('serving_model', 'frames'),
+                          pool=pool, fetch_timeout=self.config.get('fetch_timeout', 30))
+            warm_tables = self.config.get('warm_tables', ['character_details', 'student_names', 'etc_localisation', 'stat_ranking'])
+            if data.serving_model == 'records':
+                # converting every character takes a while, do it before serving
+                warm_tables = list(warm_tables) + ['character_records']
+            data.load(warm_tables)
+            # row hashes of recent data versions for the change feed
+            change_history = ChangeHistory(self.config.get('change_history_size', 10),
+                                           Path(self.config['change_history_dir']) if 'change_history_dir' in self.config else None)
+            # recorded straight away, clients can hold a version nobody asked /changes about
+            change_history.record(data.data_version, data.row_hashes)
+            self.change_history = change_history
+            self.data = data
+            self.error = None
+            self._finished.set()
+        except Exception as err:
+            logger.exception('Failed to load game data for dataset %s (attempt %d)', self.name, self.attempts)
+            self.error = repr(err)
+            max_attempts = self.config.get('load_max_attempts')
+            if max_attempts is not None and self.attempts >= max_attempts:
+                # out of attempts, stop anyone waiting
+                self._finished.set()
+
+        return self.ready
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    @property
+    def ready(self):
+        return self.data is not None
+
+    def wait(self, timeout=None):
+        """Blocks until loading is over
+
+        :param timeout: seconds to wait for, None to wait forever
+        :return bool: whether the data is loaded
+        """
+        self._finished.wait(timeout)
+        return self.ready
+
+
+class DatasetRegistry:
+    def __init__(self, config):
+        """ Named datasets served side by side, e.g. the latest JP data, the global client and the previous patch
+
+        Settings in ``datasets`` override the top level ones for each dataset. Derived tables built from
+        identical source tables are shared between datasets, so only what differs is held more than once.
+
+        :param config: the app configuration, see config.json
+        """
+        self.config = config
+        datasets = config.get('datasets') or {'default': {}}
+        self.default = config.get('default_dataset', next(iter(datasets)))
+        self.datasets = {}
+        for name, overrides in datasets.items():
+            dataset_config = {**config, **overrides}
+            # datasets can't share the same snapshot or change history files
+            for key in ('snapshot_dir', 'change_history_dir'):
+                if key in config and key not in overrides and len(datasets) > 1:
+                    dataset_config[key] = str(Path(config[key]) / name)
+            self.datasets[name] = DataState(dataset_config, name)
+        self._loader = None
+
+    def start(self):
+        """Starts loading every dataset in a background thread"""
+        self._loader = threading.Thread(target=self.load, name='badapi-loader', daemon=True)
+        self._loader.start()
+
+    def join(self, timeout=None):
+        """Blocks until the background thread has loaded every dataset
+
+        :param timeout: seconds to wait for, None to wait forever
+        :return bool: whether the thread is done
+        """
+        if self._loader is not None:
+            self._loader.join(timeout)
+            return not self._loader.is_alive()
+
+        return True
+
+    def load(self):
+        """Loads every dataset one after the other, the default first, so later ones reuse the tables built by earlier ones.
+        Datasets that fail are retried with exponential backoff, until ``load_max_attempts`` if set
+        """
+        # pandas is only imported here, so importing the package and creating the app stay fast
+        from badapi.tables import SharedPool
+
+        pool = SharedPool()
+        pending = sorted(self.datasets, key=lambda n: n != self.default)
+        delay = self.config.get('load_retry_delay', 5)
+        while True:
+            pending = [name for name in pending if not self.datasets[name].load(pool) and not self.datasets[name].finished]
+            if not pending:
+                break
+            logger.info('Retrying datasets %s in %s seconds', ', '.join(pending), delay)
+            time.sleep(delay)
+            delay = min(delay * 2, self.config.get('load_retry_max_delay', 300))
+
+    def wait(self, timeout=None):
+        """Blocks until the default dataset is loaded
+
+        :param timeout: seconds to wait for, None to wait forever
+        :return bool: whether the default dataset is loaded
+        """
+        return self.datasets[self.default].wait(timeout)
+
+
+def create_app(config=None):
+    """Creates the Flask app and starts loading its data in a background thread, without waiting for it
+
+    :param config: dictionary of settings, or path to a JSON file with them. Defaults to config.json
+    :return Flask: the app, answering 503 for each dataset until it is loaded
+    """
+    if config is None or isinstance(config, (str, Path)):
+        with open(config or 'config.json') as f:
+            config = json.load(f)
+
+    app = Flask(__name__)
+    app.config['JSON_SORT_KEYS'] = False
+    app.json_encoder = NumpyEncoder
+    app.register_blueprint(bp)
+
+    registry = DatasetRegistry(config)
+    app.extensions['badapi'] = registry
+    registry.start()
+
+    return app
 
 
 if __name__=="__main__":
-    app.run()
+    create_app().run()
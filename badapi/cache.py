@@ -0,0 +1,157 @@
+import gzip
+from collections import OrderedDict
+from threading import Event, Lock
+
+from badapi.localization import Localization
+
+# optional compressors, only used when installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# content codings every cached body is precompressed into
+# no timestamp in gzip headers so the same body always compresses to the same bytes
+compressors = {'gzip': lambda body: gzip.compress(body, compresslevel=9, mtime=0)}
+if brotli is not None:
+    compressors['br'] = lambda body: brotli.compress(body, quality=9)
+if zstandard is not None:
+    # compressor objects aren't thread safe so make one per body
+    compressors['zstd'] = lambda body: zstandard.ZstdCompressor(level=12).compress(body)
+
+# preferred order when the client accepts several codings equally
+coding_preference = ['zstd', 'br', 'gzip', 'identity']
+
+
+def cache_key(path, args):
+    """Normalises a request into a cache key
+
+    :param path: the request path
+    :param args: the request query arguments as a MultiDict
+    :return tuple: key that is insensitive to the order of query parameters and their repeated values
+    """
+    lang = frozenset(Localization(*args.getlist('lang')).lang)
+    query = tuple(sorted((k, tuple(sorted(v))) for k, v in args.lists() if k != 'lang'))
+
+    return (path, query, lang)
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """ LRU cache of serialised response bodies along with their precompressed variants
+
+        :param max_bytes: total size of all stored variants before the least recently used entries are evicted
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = Lock()
+
+    def _reset(self, version):
+        # everything cached belongs to an older data version
+        self._entries.clear()
+        self._size = 0
+        self._version = version
+
+    def get(self, key, version):
+        """Gets the variants cached for a key
+
+        :param key: the normalised request key
+        :param version: the current data version, a different version invalidates the cache
+        :return dict: content coding to body, or None if not cached
+        """
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def put(self, key, version, body):
+        """Compresses a serialised body into every available coding and caches the result
+
+        :param key: the normalised request key
+        :param version: the data version the body was built from
+        :param body: the uncompressed response body in bytes
+        :return dict: content coding to body
+        """
+        entry = {'identity': body}
+        for coding, compress in compressors.items():
+            entry[coding] = compress(body)
+        entry_size = sum(map(len, entry.values()))
+
+        # too big to ever fit, don't flush everything else for it
+        if entry_size > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            if (old := self._entries.pop(key, None)) is not None:
+                self._size -= sum(map(len, old.values()))
+            self._entries[key] = entry
+            self._size += entry_size
+            # evict least recently used
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sum(map(len, evicted.values()))
+
+        return entry
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """ Coalesces concurrent calls with the same key, so only the first one does the work and the rest share its result """
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key, func):
+        """Calls a function, or waits for an identical call that is already in progress
+
+        :param key: identifies identical calls
+        :param func: callable doing the work
+        :return: the result of the call, exceptions are raised in every waiting caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as err:
+            call.error = err
+            raise
+        finally:
+            # later calls start a new flight
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
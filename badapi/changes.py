@@ -0,0 +1,95 @@
+import json
+from collections import OrderedDict
+from threading import Lock
+
+import pandas as pd
+
+
+def hash_rows(df, id_col):
+    """Hashes the content of every row of a table
+
+    :param df: the table to hash
+    :param id_col: the column identifying each row
+    :return Series: 64 bit hash of each row, indexed by ID
+    """
+    df = df.drop_duplicates(subset=id_col).set_index(id_col)
+    # stringify first so list cells can be hashed too
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+
+    return pd.Series(hashes.to_numpy(), index=df.index)
+
+
+def diff_hashes(old, new):
+    """Compares the row hashes of two versions of a table
+
+    :param old: row hashes of the older version
+    :param new: row hashes of the newer version
+    :return dict: lists of added, removed and modified IDs
+    """
+    common = old.index.intersection(new.index)
+    modified = old.reindex(common).to_numpy() != new.reindex(common).to_numpy()
+
+    return {
+        'Added': new.index.difference(old.index).tolist(),
+        'Removed': old.index.difference(new.index).tolist(),
+        'Modified': common[modified].tolist()
+    }
+
+
+class ChangeHistory:
+    def __init__(self, max_versions=10, path=None):
+        """ Bounded history of the row hashes of every data version, used to compute incremental changes
+
+        :param max_versions: number of versions to remember, the oldest are forgotten first
+        :param path: directory to persist the history in so it survives restarts, None to keep it in memory only
+        """
+        self.max_versions = max_versions
+        self._path = path
+        self._versions = OrderedDict()
+        self._lock = Lock()
+
+        if path is not None and (path / 'index.json').exists():
+            for version in json.loads((path / 'index.json').read_text()):
+                if (version_file := path / f'{version}.json').exists():
+                    self._versions[version] = {resource: pd.Series(h['Hashes'], index=h['Ids'], dtype='uint64')
+                                               for resource, h in json.loads(version_file.read_text()).items()}
+
+    def __contains__(self, version):
+        return version in self._versions
+
+    def record(self, version, row_hashes):
+        """Remembers the row hashes of a data version
+
+        :param version: the data version
+        :param row_hashes: dictionary of resource name to its row hashes
+        """
+        with self._lock:
+            if version in self._versions:
+                return
+            self._versions[version] = row_hashes
+            forgotten = []
+            while len(self._versions) > self.max_versions:
+                forgotten.append(self._versions.popitem(last=False)[0])
+
+            if self._path is not None:
+                self._path.mkdir(parents=True, exist_ok=True)
+                (self._path / f'{version}.json').write_text(json.dumps(
+                    {resource: {'Ids': h.index.tolist(), 'Hashes': h.tolist()} for resource, h in row_hashes.items()}))
+                for old_version in forgotten:
+                    (self._path / f'{old_version}.json').unlink(missing_ok=True)
+                (self._path / 'index.json').write_text(json.dumps(list(self._versions)))
+
+    def changes(self, since, version):
+        """Gets the IDs that changed between two data versions
+
+        :param since: the older data version
+        :param version: the newer data version
+        :return dict: added, removed and modified IDs for each resource, None if either version isn't known
+        """
+        with self._lock:
+            old = self._versions.get(since)
+            new = self._versions.get(version)
+        if old is None or new is None:
+            return None
+
+        return {resource: diff_hashes(old.get(resource, pd.Series(dtype='uint64')), hashes) for resource, hashes in new.items()}
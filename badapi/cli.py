@@ -0,0 +1,182 @@
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from badapi import create_app
+from badapi.cache import compressors
+from badapi.constants import character_resources, asset_resources
+from badapi.localization import Localization
+
+# file suffixes of the precompressed variants, as expected by nginx gzip_static/brotli_static
+compressed_suffixes = {
+    'gzip': '.gz',
+    'br': '.br',
+    'zstd': '.zst'
+}
+
+# number of routes each worker renders at a time
+_chunk_size = 200
+
+# tables the exported routes are built from, built before forking so every worker shares them
+export_tables = ['etc_localisation', 'skill_localisation', 'profile_localisation', 'character_details', 'character_stats',
+                 'character_profiles', 'character_weapon', 'character_bond_stats', 'character_skills', 'weapon_passive_bonuses',
+                 'character_skill_details', 'student_names', 'character_names', 'currencies', 'items', 'equipment',
+                 'furnitures', 'recipes', 'recipe_parcels']
+
+# app shared with the forked workers
+_app = None
+
+
+def export_routes(client):
+    """Lists every route of the API along with the file it is exported to
+
+    :param client: Flask test client of the app, used to look up the available IDs
+    :return list: list of (url, relative file path)
+    """
+    char_ids = list(json.loads(client.get('/characters/phonebook?student_only=false').data))
+    asset_ids = {resource: list(json.loads(client.get(f'/assets/{resource}/').data)) for resource in asset_resources}
+
+    routes = []
+    for lang in sorted(Localization.available_langs):
+        routes.append((f'/characters/phonebook?lang={lang}', f'{lang}/characters/phonebook.json'))
+        routes.append((f'/characters/?lang={lang}', f'{lang}/characters/index.json'))
+        for c_id in char_ids:
+            routes.append((f'/characters/{c_id}/?lang={lang}', f'{lang}/characters/{c_id}/index.json'))
+            for info in character_resources:
+                routes.append((f'/characters/{c_id}/{info}?lang={lang}', f'{lang}/characters/{c_id}/{info}.json'))
+        for resource in asset_resources:
+            routes.append((f'/assets/{resource}/?lang={lang}', f'{lang}/assets/{resource}/index.json'))
+            for idee in asset_ids[resource]:
+                routes.append((f'/assets/{resource}/{idee}?lang={lang}', f'{lang}/assets/{resource}/{idee}.json'))
+
+    return routes
+
+
+def write_if_changed(path, body):
+    """Writes a response body and its precompressed variants, unless the file already has the same content
+
+    :param path: the file to write
+    :param body: the response body in bytes
+    :return bool: whether anything was written
+    """
+    variants = {path.with_name(path.name + compressed_suffixes[coding]): compress for coding, compress in compressors.items()}
+    if path.exists() and path.read_bytes() == body and all(v.exists() for v in variants):
+        return False
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for target, content in [(path, body)] + [(v, compress(body)) for v, compress in variants.items()]:
+        # write then rename so the web server never sees a partial file
+        tmp = target.with_name(target.name + '.tmp')
+        tmp.write_bytes(content)
+        tmp.replace(target)
+
+    return True
+
+
+def remove_stale(out_dir, file_paths):
+    """Removes exported files that no route writes anymore, e.g. for deleted characters, along with directories left empty
+
+    :param out_dir: the export directory
+    :param file_paths: relative paths of every file the export writes
+    :return int: number of files removed
+    """
+    keep = set()
+    for file_path in file_paths:
+        path = out_dir / file_path
+        keep.add(path)
+        keep.update(path.with_name(path.name + suffix) for suffix in compressed_suffixes.values())
+    exported_suffixes = tuple(['.json'] + ['.json' + suffix for suffix in compressed_suffixes.values()])
+
+    removed = 0
+    for lang in Localization.available_langs:
+        if not (lang_dir := out_dir / lang).is_dir():
+            continue
+        for path in list(lang_dir.rglob('*')):
+            if path.is_file() and path.name.endswith(exported_suffixes) and path not in keep:
+                path.unlink()
+                removed += 1
+        # deepest first so parents of removed directories can go too
+        for path in sorted((p for p in lang_dir.rglob('*') if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+            if not any(path.iterdir()):
+                path.rmdir()
+
+    return removed
+
+
+def _export_chunk(out_dir, routes):
+    # runs in a forked worker, which already has the data loaded
+    client = _app.test_client()
+    counts = {'written': 0, 'unchanged': 0, 'failed': 0}
+    for url, file_path in routes:
+        response = client.get(url)
+        if response.status_code != 200:
+            counts['failed'] += 1
+        elif write_if_changed(out_dir / file_path, response.data):
+            counts['written'] += 1
+        else:
+            counts['unchanged'] += 1
+
+    return counts
+
+
+def export_api(out_dir, workers=None, config=None):
+    """Pre-renders every route of the API into a directory tree of JSON files that can be served statically
+
+    :param out_dir: the directory to export to
+    :param workers: number of worker processes, defaults to the number of CPUs
+    :param config: the app configuration, defaults to config.json
+    :return dict: number of files written, unchanged, failed and removed
+    """
+    global _app
+    if config is None or isinstance(config, (str, Path)):
+        with open(config or 'config.json') as f:
+            config = json.load(f)
+    # don't retry forever when the data source is down
+    _app = create_app({'load_max_attempts': 3, **config})
+    registry = _app.extensions['badapi']
+    # the loader thread must be done before forking, workers would inherit any lock it holds
+    registry.join()
+    # only the default dataset is exported
+    state = registry.datasets[registry.default]
+    if not state.ready:
+        raise RuntimeError(f'Failed to load game data: {state.error}')
+
+    # build every table now so the forked workers share them instead of each building their own
+    tables = export_tables + (['character_records'] if state.data.serving_model == 'records' else [])
+    for name in tables:
+        getattr(state.data, name)
+
+    routes = export_routes(_app.test_client())
+    chunks = [routes[i:i + _chunk_size] for i in range(0, len(routes), _chunk_size)]
+
+    counts = {'written': 0, 'unchanged': 0, 'failed': 0}
+    with ProcessPoolExecutor(workers or os.cpu_count(), mp_context=multiprocessing.get_context('fork')) as pool:
+        for chunk_counts in pool.map(_export_chunk, [out_dir] * len(chunks), chunks):
+            for k, v in chunk_counts.items():
+                counts[k] += v
+    counts['removed'] = remove_stale(out_dir, [file_path for _, file_path in routes])
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='badapi', description='BA Data API tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='pre-render the whole API into static JSON files')
+    export_parser.add_argument('out_dir', type=Path, help='directory to write the files to')
+    export_parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes, defaults to the number of CPUs')
+    export_parser.add_argument('-c', '--config', default='config.json', help='path to the configuration file')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        counts = export_api(args.out_dir, args.workers, args.config)
+        print(f"{counts['written']} written, {counts['unchanged']} unchanged, {counts['failed']} failed, {counts['removed']} removed")
+
+
+if __name__ == "__main__":
+    main()
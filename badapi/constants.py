@@ -42,6 +42,27 @@ recipe_keep_keys = ['Id', 'RecipeType', 'RecipeIngredientId', 'ParcelType', 'Par
                     'CostAmount', 'IngredientParcelType','IngredientId',
                     'IngredientAmount', 'CostTimeInSecond']
 
+# recipe parts and their (parcel type, parcel id, amount) columns
+recipe_component_map = {
+    'Yield': ('ParcelType', 'ParcelId', 'ResultAmountMax'),
+    'Cost': ('CostParcelType', 'CostId', 'CostAmount'),
+    'Ingredient': ('IngredientParcelType', 'IngredientId', 'IngredientAmount')
+}
+
+# asset names and the parcel type they are referenced by
+asset_parcel_type_map = {
+    'items': 'Item',
+    'equipment': 'Equipment',
+    'currencies': 'Currency',
+    'furnitures': 'Furniture'
+}
+
+# kinds of things that can use an asset
+used_by_categories = ['Recipes', 'Characters', 'Weapons', 'Skills']
+
+# fields to keep for each resolved parcel, besides its name
+parcel_keep_keys = ['ParcelType', 'ParcelId', 'Amount', 'Rarity', 'Icon']
+
 # fields to keep in skills json
 skill_keep_keys = ['GroupId', 'Id', 'MinimumGradeCharacterWeapon', 
                    'SkillCategory', 'Level', 'SkillCost', 'ExtraSkillCost', 
@@ -87,7 +108,8 @@ adaptation_multiplier_map = {
     'A': 1.1,
     'B': 1.0,
     'C': 0.9,
-    'D': 0.8
+    'D': 0.8,
+    'SS': 1.3
 }
 
 # parsing UE terrain bonus type
@@ -105,6 +127,49 @@ bond_stat_type_map = {
     'MaxHP_Base': 'Hp'
 }
 
+# stats that scale with level, stored as <Stat>1 and <Stat>100 in the stat table
+leveled_stats = ['MaxHP', 'AttackPower', 'DefensePower', 'HealPower']
+
+# multipliers for each star grade, every stat follows its own curve
+star_grade_multiplier_map = {
+    'MaxHP': {1: 1.0, 2: 1.05, 3: 1.12, 4: 1.21, 5: 1.35},
+    'AttackPower': {1: 1.0, 2: 1.1, 3: 1.22, 4: 1.36, 5: 1.53},
+    'HealPower': {1: 1.0, 2: 1.075, 3: 1.175, 4: 1.295, 5: 1.445}
+}
+
+# mood ranks from worst to best
+adaptation_ranks = ['D', 'C', 'B', 'A', 'S', 'SS']
+
+# max level of each UE tier
+weapon_tier_max_level = {1: 30, 2: 40, 3: 50, 4: 60}
+
+# UE tier from which the UE terrain bonus raises its terrain by one rank
+weapon_terrain_bonus_tier = 3
+
+# version of the shape of the responses, part of every ETag so a deploy that changes them invalidates cached bodies
+api_version = 2
+
+# most (character, configuration) combinations a single computed stats request can ask for
+max_stat_combinations = 100000
+
+# stats boosted by the UE, stored as <Stat> and <Stat>100 in the weapon table
+weapon_stats = ['MaxHP', 'AttackPower', 'HealPower']
+
+# bond stat names to the stat they add to
+bond_stat_column_map = {
+    'Attack': 'AttackPower',
+    'Defence': 'DefensePower',
+    'Heal': 'HealPower',
+    'Hp': 'MaxHP'
+}
+
+# terrain names to their affinity stat column
+terrain_affinity_map = {
+    'Urban': 'UrbanAffinity',
+    'Outdoor': 'OutdoorAffinity',
+    'Indoor': 'IndoorAffinity'
+}
+
 # dictionary to rename all the stat fields to something sensible
 character_stats_column_map = {
     'StabilityPoint': 'Stability',
@@ -123,6 +188,10 @@ character_stats_column_map = {
     'IndoorBattleAdaptation': 'IndoorAffinity',
 }
 
+# character stats that can be ranked, UE stats are ranked with a Weapon prefix
+ranked_stats = [s + suffix for s in leveled_stats for suffix in ('1', '100')] + list(character_stats_column_map.values())
+ranked_weapon_stats = [s + suffix for s in weapon_stats for suffix in ('', '100')]
+
 # parsing stats used in JP skill descriptions
 jp_stat_name_map = {
     '会心ダメージ': "CritDmg",
@@ -164,6 +233,13 @@ action_map = {
     '減少': "Debuff"
 }
 
+# tables available for each character under /characters/<ID>/<Info>
+character_resources = ['info', 'stats', 'details', 'profile', 'skills', 'skill_details',
+                       'weapon', 'weapon_passive', 'bond']
+
+# assets available under /assets/<Asset>/
+asset_resources = ['skills', 'items', 'equipment', 'currencies', 'furnitures', 'recipes']
+
 # fields to keep for individual character data
 # basic details
 info_keep_keys = ['Id', 'DevName', 'BackupName', 'ProductionStep', 'IsPlayableCharacter',
@@ -200,3 +276,18 @@ profile_localize_keys = ['StatusMessage', 'FullName', 'FamilyName', 'FamilyNameR
                      'Birthday', 'CharHeight', 'ArtistName', 'CharacterVoice', 'Hobby', 
                      'WeaponName', 'WeaponDesc', 'ProfileIntroduction', 'CharacterSSRNew'] 
 
+
+# source tables fetched from the JP data root, hashed to get the data version
+source_tables_jp = ['CharacterAcademyTagsExcelTable.json', 'CharacterExcelTable.json',
+                    'CharacterStatExcelTable.json', 'CharacterWeaponExcelTable.json',
+                    'CharacterSkillListExcelTable.json', 'SkillExcelTable.json',
+                    'FavorLevelRewardExcelTable.json', 'CurrencyExcelTable.json',
+                    'ItemExcelTable.json', 'EquipmentExcelTable.json',
+                    'EquipmentStatExcelTable.json', 'FurnitureExcelTable.json',
+                    'RecipeExcelTable.json', 'RecipeIngredientExcelTable.json',
+                    'LocalizeEtcExcelTable.json', 'LocalizeSkillExcelTable.json',
+                    'LocalizeCharProfileExcelTable.json']
+
+# source tables fetched from the global data root
+source_tables_global = ['LocalizeEtcExcelTable.json', 'LocalizeSkillExcelTable.json',
+                        'LocalizeCharProfileExcelTable.json']
@@ -29,3 +29,66 @@ class Localization:
     def all_langs(cls):
         return cls(*cls.available_langs)
 
+
+
+class LocalisationStore:
+    def __init__(self, tables):
+        """ Localised text kept apart from the data tables, one compact table per language
+        
+        :param tables: dictionary of capitalised language to a DataFrame indexed by localisation key, one column per localised field
+        """
+        self._tables = tables
+    
+    def attach(self, df, key_col, fields, lang):
+        """Adds localised text columns for the requested languages to a table
+        
+        :param df: the table to add text to
+        :param key_col: column of the table holding the localisation keys
+        :param fields: localised fields to add, e.g. Name, Description
+        :param lang: the localisation languages to add
+        :return DataFrame: copy of the table with the added <Field><Lang> columns, empty for missing keys and languages
+        """
+        keys = df[key_col].to_numpy()
+        columns = {}
+        for l in lang.lang:
+            if l not in self._tables:
+                columns.update({f + l: '' for f in fields})
+                continue
+            local_df = self._tables[l].reindex(keys)
+            for f in fields:
+                columns[f + l] = local_df[f].fillna('').to_numpy()
+        
+        return df.assign(**columns)
+    
+    def split_column(self, column):
+        """Splits a localised column name into its field and language, e.g. NameEn into (Name, En)
+        
+        :param column: the column name
+        :return tuple: (field, capitalised language), None if it isn't a localised field of this store
+        """
+        for l, table in self._tables.items():
+            if column.endswith(l) and column[:-len(l)] in table.columns:
+                return column[:-len(l)], l
+        
+        return None
+    
+    def memory_usage(self):
+        """Gets the memory held by the text of every language in bytes"""
+        return sum(int(table.memory_usage(deep=True).sum()) for table in self._tables.values())
+    
+    def get(self, key, fields, lang):
+        """Gets the localised text of a single key
+        
+        :param key: the localisation key
+        :param fields: localised fields to get
+        :param lang: the localisation languages to get
+        :return dict: text indexed by <Field><Lang>, empty for missing keys and languages
+        """
+        text = {}
+        for l in lang.lang:
+            table = self._tables.get(l)
+            row = table.loc[key] if table is not None and key in table.index else None
+            for f in fields:
+                text[f + l] = row[f] if row is not None else ''
+        
+        return text
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from badapi.constants import ranked_stats, ranked_weapon_stats
+
+
+class StatRanking:
+    def __init__(self, stats_df, weapon_df):
+        """ Presorted index arrays over every numeric character stat, so top-k queries walk an index instead of sorting
+
+        :param stats_df: the character stats table
+        :param weapon_df: the character UE table, its stats are ranked with a Weapon prefix
+        """
+        weapon_cols = [c for c in ranked_weapon_stats if c in weapon_df.columns]
+        weapon_df = weapon_df[['CharacterId'] + weapon_cols].drop_duplicates(subset='CharacterId')\
+                                                            .rename(columns={c: 'Weapon' + c for c in weapon_cols})
+        df = stats_df.drop_duplicates(subset='CharacterId').merge(weapon_df, how='left', on='CharacterId')
+
+        self.index = pd.Index(df.CharacterId)
+        ids = self.index.to_numpy()
+        # only real stats, not IDs or other numbers in the tables
+        numeric_cols = set(df.select_dtypes('number').columns)
+        self.stats = [c for c in ranked_stats + ['Weapon' + c for c in weapon_cols] if c in numeric_cols]
+        self.values = {}
+        self._desc = {}
+        self._asc = {}
+        for stat in self.stats:
+            values = df[stat].to_numpy(dtype=float)
+            # characters without the stat (e.g. no UE) are left out of the ranking
+            rows = np.flatnonzero(~np.isnan(values))
+            self.values[stat] = values
+            # ties are broken by character ID in both directions
+            self._desc[stat] = rows[np.lexsort((ids[rows], -values[rows]))]
+            self._asc[stat] = rows[np.lexsort((ids[rows], values[rows]))]
+
+    def rank(self, stat, char_ids=None, top=10, ascending=False):
+        """Gets the characters with the highest (or lowest) value of a stat
+
+        :param stat: the stat to rank by, one of self.stats
+        :param char_ids: IDs of the characters to rank, None for all of them
+        :param top: number of characters to return
+        :param ascending: rank the lowest values first
+        :return list: list of (character ID, stat value), best first
+        """
+        order = (self._asc if ascending else self._desc)[stat]
+        if char_ids is not None:
+            selected = np.zeros(len(self.index), dtype=bool)
+            rows = self.index.get_indexer(char_ids)
+            selected[rows[rows >= 0]] = True
+            order = order[selected[order]]
+        order = order[:max(top, 0)]
+
+        values = self.values[stat][order]
+        # whole numbers are served as ints
+        values = [int(v) if v.is_integer() else v for v in values.tolist()]
+
+        return list(zip(self.index[order].tolist(), values))
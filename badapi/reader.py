@@ -4,12 +4,30 @@
 
 import pandas as pd
 import json
+import math
 import requests
 import functools
+import hashlib
+import os
 import re
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+import numpy as np
 from numpy import logical_or, logical_and, nan
 
-from badapi.localization import Localization
+from badapi.localization import Localization, LocalisationStore
+from badapi.changes import hash_rows, diff_hashes
+from badapi.search import SearchIndex
+from badapi.ranking import StatRanking
+from badapi.records import build_character_records
+from badapi.stats import StatsEngine
+from badapi.tables import SharedPool, TableManager, managed_table
 from badapi.constants import *
 
 
@@ -107,78 +125,310 @@ def _parse_skill_desc(df):
     return pd.DataFrame(skill_effects)
 
 
-def _get_game_data(url):
-    response = requests.get(url).json()
+def _explode_parcels(df, components):
+    """Expands the parcel list columns of a table into one row per parcel
+    
+    :param df: table with an Id column and parcel list columns
+    :param components: dictionary of component name to its (parcel type, parcel id, amount) columns
+    :return DataFrame: the Id, Component, ParcelType, ParcelId and Amount of every parcel
+    """
+    parcels = []
+    for component, (type_col, id_col, amount_col) in components.items():
+        # one row per parcel instead of one list per row
+        parcel_df = df[['Id', type_col, id_col, amount_col]]\
+                        .rename(columns={type_col: 'ParcelType', id_col: 'ParcelId', amount_col: 'Amount'})\
+                        .explode(['ParcelType', 'ParcelId', 'Amount'])\
+                        .dropna(subset=['ParcelId'])
+        parcels.append(parcel_df.assign(Component=component))
+    
+    return pd.concat(parcels, ignore_index=True).astype({'ParcelId': 'int64', 'Amount': 'int64'})
+
+
+def _fetch_game_data(url, timeout=None):
+    response = requests.get(url, timeout=timeout)
+    # error pages must never be hashed into the data version
+    response.raise_for_status()
+    
+    return response.content
+
+
+def _write_atomic(path, raw):
+    # uniquely named temporary file, so readers never see a partial file and concurrent writers never clash
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+    tmp.write_bytes(raw)
+    tmp.replace(path)
+
+
+def _parse_game_data(raw):
+    response = json.loads(raw)
     data = pd.json_normalize(response['DataList'])
 
     return data    
 
 
 class BAData:
-    def __init__(self, url_root, url_global_root):
-        """ Creates an instance of BA DataFrame by getting the required Excel tables from the repository root
-        and then processing with Pandas
+    def __init__(self, url_root, url_global_root, snapshot_dir=None, max_table_bytes=None, from_snapshot=False, serving_model='frames',
+                 pool=None, fetch_timeout=30):
+        """ Creates an instance of BA DataFrame that gets the required Excel tables from the repository root
+        and then processes them with Pandas. Nothing is fetched until the tables are first needed or load is called
             
         :param url_root: URL of the root directory where the data tables are located. Make sure the tables are delivered in plain text
+        :param snapshot_dir: directory to keep the fetched source tables in, every table is built from this copy.
+                             Defaults to a temporary directory that is removed along with the instance
+        :param max_table_bytes: memory budget for derived tables, cold tables over the budget are evicted. None for no limit
+        :param from_snapshot: use source tables already in the snapshot directory instead of fetching them again
+        :param serving_model: 'frames' to build character responses from the tables on every request,
+                              'records' to convert every character once into plain Python records and serve those
+        :param pool: SharedPool of derived tables shared with other datasets, tables built from identical sources are only held once
+        :param fetch_timeout: seconds to wait on the data source before giving up, None to wait forever
         """
-        # fix url if is not a directory
-        for u in (url_root, url_global_root):
-            if ~u.endswith('/'):
-                u += '/'
-
-            # try if the url has some of the required files
-            try:
-                requests.get(u + "CharacterAcademyTagsExcelTable.json")
-            except requests.exceptions.RequestException as err:
-                print(f'Cannot find data tables from specified URL {u}')
-                raise err
-            
         self._url_root = url_root
         self._url_global_root = url_global_root
+        self._fetch_timeout = fetch_timeout
+        # only a configured snapshot directory outlives the process
+        self._persistent_snapshot = snapshot_dir is not None
+        self._from_snapshot = from_snapshot and snapshot_dir is not None
+        if snapshot_dir is None:
+            snapshot_dir = tempfile.mkdtemp(prefix='badapi-snapshot-')
+            weakref.finalize(self, shutil.rmtree, snapshot_dir, True)
+        self._snapshot_dir = Path(snapshot_dir)
+        # holds every derived table
+        self._tables = TableManager(max_table_bytes, on_evict=self._release_table)
+        self._pool = pool if pool is not None else SharedPool()
+        # pool key of every table held
+        self._pool_keys = {}
+        # source tables read by the derived tables being built in each thread
+        self._tracking = threading.local()
+        self.serving_model = serving_model
+        # content digests of every source table fetched so far, keyed by URL
+        self._source_digests = {}
+        self._source_lock = threading.Lock()
+
+    def _read_source(self, root, table_name):
+        """Reads the raw contents of a source table. It is only fetched the first time,
+        afterwards it is always read from the snapshot so every table is built from the bytes that were hashed.
+        Snapshots are stored by content digest, so processes sharing the snapshot directory never overwrite each other's
+        
+        :param root: URL of the data root to fetch from
+        :param table_name: name of the JSON file containing the table
+        :return bytes: the raw table
+        """
+        url = root + table_name
+        region = 'jp' if root == self._url_root else 'global'
+        for dependencies in getattr(self._tracking, 'stack', []):
+            dependencies.add((region, table_name))
+        snapshots = self._snapshot_dir / region / table_name
+        
+        with self._source_lock:
+            digest = self._source_digests.get(url)
+            if digest is None:
+                # digest of the latest fetch, only trusted when told to since it may be stale
+                latest = snapshots / 'latest'
+                if self._from_snapshot and latest.exists():
+                    raw = (snapshots / latest.read_text().strip()).read_bytes()
+                    digest = hashlib.sha1(raw).hexdigest()
+                else:
+                    raw = _fetch_game_data(url, self._fetch_timeout)
+                    digest = hashlib.sha1(raw).hexdigest()
+                    if not (snapshots / digest).exists():
+                        _write_atomic(snapshots / digest, raw)
+                    _write_atomic(latest, digest.encode())
+                self._source_digests[url] = digest
+                return raw
+        
+        raw = (snapshots / digest).read_bytes()
+        if hashlib.sha1(raw).hexdigest() != digest:
+            raise RuntimeError(f'Snapshot {digest} of {url} is corrupt')
+        
+        return raw
+
+    def load(self, warm_tables=()):
+        """Fetches every source table and computes the data version, so requests don't wait on the network
+        
+        :param warm_tables: names of derived tables to build straight away
+        """
+        if not self._from_snapshot:
+            for u in (self._url_root, self._url_global_root):
+                # try if the url has some of the required files
+                try:
+                    requests.get(u + "CharacterAcademyTagsExcelTable.json", timeout=self._fetch_timeout).raise_for_status()
+                except requests.exceptions.RequestException as err:
+                    print(f'Cannot find data tables from specified URL {u}')
+                    raise err
+        
+        self.data_version
+        self.version_seen_at
+        for name in warm_tables:
+            getattr(self, name)
+
+    def _get_table(self, name, func):
+        """Gets a derived table, from the shared pool if another dataset already built it from the same sources
+        
+        :param name: name of the table
+        :param func: method that builds the table
+        :return: the table
+        """
+        value = self._tables.get(name, lambda: self._build_table(name, func))
+        # tables being built from this one depend on its sources too
+        for dependencies in getattr(self._tracking, 'stack', []):
+            dependencies.update(self._pool.dependencies(name) or ())
+        
+        return value
+    
+    def _pool_key(self, name, dependencies):
+        # None when some source hasn't been read by this instance yet
+        digests = []
+        for region, table_name in sorted(dependencies):
+            url = (self._url_root if region == 'jp' else self._url_global_root) + table_name
+            if url not in self._source_digests:
+                return None
+            digests.append((region, table_name, self._source_digests[url]))
+        
+        return (name, tuple(digests))
+    
+    def _build_table(self, name, func):
+        dependencies = self._pool.dependencies(name)
+        key = self._pool_key(name, dependencies) if dependencies is not None else None
+        
+        if key is None:
+            # first build, find out which sources the table is built from
+            stack = self._tracking.__dict__.setdefault('stack', [])
+            stack.append(set())
+            try:
+                value = func(self)
+            finally:
+                dependencies = stack.pop()
+            self._pool.set_dependencies(name, dependencies)
+            key = self._pool_key(name, dependencies)
+            if key is None:
+                return value
+            value = self._pool.acquire(key, lambda: value)
+        else:
+            value = self._pool.acquire(key, lambda: func(self))
+        
+        self._pool_keys[name] = key
+        return value
+    
+    def _release_table(self, name):
+        if (key := self._pool_keys.pop(name, None)) is not None:
+            self._pool.release(key)
+    
+    def _get_game_data(self, root, table_name):
+        """Fetches a source table from one of the data roots
+        
+        :param root: URL of the data root to fetch from
+        :param table_name: name of the JSON file containing the table
+        :return DataFrame: the normalised table
+        """
+        return _parse_game_data(self._read_source(root, table_name))
+    
+    @functools.cached_property
+    def data_version(self):
+        """Hash of the contents of every source table, changes whenever the game data does"""
+        version = hashlib.sha1()
+        for region, root, tables in (('jp', self._url_root, source_tables_jp), ('global', self._url_global_root, source_tables_global)):
+            for table_name in tables:
+                url = root + table_name
+                # only fetch tables that haven't been hashed while building other properties
+                if url not in self._source_digests:
+                    self._read_source(root, table_name)
+                version.update(f'{region}/{table_name}:{self._source_digests[url]}\n'.encode())
+        
+        return version.hexdigest()[:16]
+    
+    @functools.cached_property
+    def response_version(self):
+        """Validator of every response, the data version along with the API version since either changes the responses"""
+        return f'{self.data_version}-{api_version}'
+    
+    @functools.cached_property
+    def version_seen_at(self):
+        """Time the response version was first seen, used as Last-Modified. It is persisted in the snapshot directory
+        so every worker and restart agrees on it, None without a configured snapshot directory
+        """
+        if not self._persistent_snapshot:
+            return None
+        
+        marker = self._snapshot_dir / 'versions' / self.response_version
+        if not marker.exists():
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            tmp = marker.with_name(f'{marker.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+            tmp.write_text(datetime.now(timezone.utc).replace(microsecond=0).isoformat())
+            try:
+                # linking fails if another process got there first, its time wins
+                os.link(tmp, marker)
+            except FileExistsError:
+                pass
+            finally:
+                tmp.unlink()
+        
+        return datetime.fromisoformat(marker.read_text())
 
-    def combine_localisation(self, table_name):
+    def combine_localisation(self, table_name, fields, key='Key'):
         """Combines JP and global localisation files for a particular localisation table
         
         :param table_name: name of the JSON file containing localisation data, common across both clients
-        :return combined_table: the combined localisation table
+        :param fields: the localised fields to keep, e.g. Name, Description
+        :param key: the column holding the localisation key
+        :return LocalisationStore: the combined localisation text, split by language
         """
         # get jp and global localisation files
-        loc_jp = _get_game_data(self._url_root + table_name)
-        loc_gl = _get_game_data(self._url_global_root + table_name)
+        loc_jp = self._get_game_data(self._url_root, table_name).drop_duplicates(subset=key).set_index(key)
+        loc_gl = self._get_game_data(self._url_global_root, table_name).drop_duplicates(subset=key).set_index(key)
+        # use all the latest keys from JP
+        loc_gl = loc_gl.reindex(loc_jp.index)
         
-        # merge tables, using all the latest keys from JP
-        loc_comb = pd.merge(loc_jp, loc_gl, how='left', on='Key', suffixes=[None, '_dupe'])
-        loc_comb.fillna('', inplace=True)
+        # take each language from JP if it has it, otherwise from global
+        tables = {}
+        for lang in Localization.all_langs().lang:
+            columns = {}
+            for f in fields:
+                source = loc_jp if f + lang in loc_jp.columns else loc_gl
+                columns[f] = source[f + lang].fillna('') if f + lang in source.columns else ''
+            tables[lang] = pd.DataFrame(columns, index=loc_jp.index)
         
-        return loc_comb
+        return LocalisationStore(tables)
     
-    @functools.cached_property
+    @managed_table
+    def etc_localisation(self):
+        """Gets the names and descriptions of characters and assets"""
+        return self.combine_localisation("LocalizeEtcExcelTable.json", ['Name', 'Description'])
+    
+    @managed_table
+    def skill_localisation(self):
+        """Gets the names and descriptions of skills"""
+        return self.combine_localisation("LocalizeSkillExcelTable.json", ['Name', 'Description'])
+    
+    @managed_table
+    def profile_localisation(self):
+        """Gets the localised character profiles"""
+        return self.combine_localisation("LocalizeCharProfileExcelTable.json", profile_localize_keys, key='CharacterId')
+    
+    @managed_table
     def character_stats(self):
         """Gets character stats table from the repo"""
         # fetch character stats
-        chars_df = _get_game_data(self._url_root + "CharacterStatExcelTable.json")
+        chars_df = self._get_game_data(self._url_root, "CharacterStatExcelTable.json")
         # rename columns with predefined dictionary
         chars_df = chars_df.rename(columns=character_stats_column_map)
         
         return chars_df
         
-    @functools.cached_property
+    @managed_table
     def character_details(self):
         """Gets character details from the repo"""
         # get additional character details from other table
-        details_df = _get_game_data(self._url_root + "CharacterExcelTable.json")
+        details_df = self._get_game_data(self._url_root, "CharacterExcelTable.json")
         # fix some damage type values
         details_df.BulletType = details_df.BulletType.replace(damage_type_map)
         details_df.ArmorType = details_df.BulletType.replace(armour_type_map)
         
-        # localisation for character names
-        localisation_df = self.combine_localisation("LocalizeEtcExcelTable.json")
         # backup names for ones that don't have english names yet
-        backup_name_df = _get_game_data(self._url_root + "CharacterAcademyTagsExcelTable.json")[['Id', 'FavorItemUniqueTags']]
+        backup_name_df = self._get_game_data(self._url_root, "CharacterAcademyTagsExcelTable.json")[['Id', 'FavorItemUniqueTags']]
         backup_name_df['BackupName'] = backup_name_df['FavorItemUniqueTags'].map(lambda x: x[0].replace('F_', '').replace('_default', ''))
         
-        # merge with localisation table for names
-        details_df = details_df.merge(localisation_df, how='left', left_on='LocalizeEtcId', right_on='Key')
+        # names are looked up by LocalizeEtcId when needed
         details_df = details_df.merge(backup_name_df[['Id', 'BackupName']], how='left', on='Id', suffixes=[None,'_dupe'])
         details_df.BackupName.fillna("", inplace=True)
         
@@ -188,23 +438,19 @@ class BAData:
         
         return details_df
     
-    @functools.cached_property
+    @managed_table
     def character_profiles(self):
         """Gets character profiles from the repo"""
-        profiles_jp = _get_game_data(self._url_root + "LocalizeCharProfileExcelTable.json")
-        profiles_gl = _get_game_data(self._url_global_root + "LocalizeCharProfileExcelTable.json")
-        
-        # merge tables, using all the latest keys from JP
-        profiles_comb = pd.merge(profiles_jp, profiles_gl, how='left', on='CharacterId', suffixes=[None, '_dupe'])
-        profiles_comb.fillna('', inplace=True)
+        profiles_jp = self._get_game_data(self._url_root, "LocalizeCharProfileExcelTable.json")
         
-        return profiles_comb
+        # localised fields live in the profile localisation store
+        return profiles_jp.drop(columns=Localization.all_langs().localize(*profile_localize_keys), errors='ignore')
         
-    @functools.cached_property
+    @managed_table
     def character_weapon(self):
         """Gets character UE stats from the repo"""
         # get most of the UE stats from the UE table
-        ue_df = _get_game_data(self._url_root + "CharacterWeaponExcelTable.json")
+        ue_df = self._get_game_data(self._url_root, "CharacterWeaponExcelTable.json")
         # fix terrain bonus text
         ue_df['TerrainBonus'] = ue_df.StatType.map(lambda x: adaptation_weapon_map[x[2]])
         # rename Id column to be more consistent
@@ -212,25 +458,23 @@ class BAData:
         
         return ue_df
     
-    @functools.cached_property
+    @managed_table
     def character_bond_stats(self):
         """Gets character bond level stat bonuses"""
         # get character bond stats from game data
-        bond_df = _get_game_data(self._url_root + "FavorLevelRewardExcelTable.json")
+        bond_df = self._get_game_data(self._url_root, "FavorLevelRewardExcelTable.json")
         # process the bond stat and then reset index to get CharacterId back
         bond_stats_df = bond_df.groupby('CharacterId').apply(_split_bond_stat).reset_index().rename(columns={ 'level_1': 'Level' })
         
         return bond_stats_df
     
-    @functools.cached_property
+    @managed_table
     def character_skills(self):
-        """Gets character skill data and localisation files"""
+        """Gets character skill data"""
         # fetch the character skills data
-        char_skill_df = _get_game_data(self._url_root + "CharacterSkillListExcelTable.json")
+        char_skill_df = self._get_game_data(self._url_root, "CharacterSkillListExcelTable.json")
         # fetch the skill table
-        skill_df = _get_game_data(self._url_root + "SkillExcelTable.json")
-        # fetch the skill localisation table
-        localisation_df = self.combine_localisation("LocalizeSkillExcelTable.json")
+        skill_df = self._get_game_data(self._url_root, "SkillExcelTable.json")
         
         # remove form conversion entries
         char_skill_df = char_skill_df[~char_skill_df['IsFormConversion']]
@@ -254,27 +498,30 @@ class BAData:
         
         # join both tables with character skill table with the appropriate keys
         char_skill_df = char_skill_df.merge(skill_df, how='left', on='GroupId')
-        char_skill_df = char_skill_df.merge(localisation_df, how='left', left_on='LocalizeSkillId', right_on='Key')
         
         return char_skill_df
         
-    @functools.cached_property
+    @managed_table
     def weapon_passive_bonuses(self):
         """Parses UE passive skill bonuses from the localisation table"""
         char_skill_df = self.character_skills
         # select only entries with UE tier 2 get UE passive info
         char_ue_skill_df = char_skill_df[char_skill_df.GroupId.str.contains('WeaponPassive')]#[(char_skill_df['MinimumGradeCharacterWeapon']==2) & (char_skill_df['SkillCategory']=='Passive')]
+        # JP descriptions are parsed for the values
+        char_ue_skill_df = self.skill_localisation.attach(char_ue_skill_df, 'LocalizeSkillId', ['Description'], Localization('jp'))
         # group by passive skill group id and get UE passive bonus
         ue_passive_df = char_ue_skill_df.groupby('CharacterId', sort=False).apply(_parse_ue_passive_stats)
         
         return ue_passive_df
     
-    @functools.cached_property
+    @managed_table
     def character_skill_details(self):
         """Parses most character skills from the localisation table"""
         char_skill_df = self.character_skills
         # select only students and only base skills without UE
         char_skill_df2 = char_skill_df[char_skill_df['MinimumGradeCharacterWeapon']==0]
+        # JP descriptions are parsed for the values
+        char_skill_df2 = self.skill_localisation.attach(char_skill_df2, 'LocalizeSkillId', ['Description'], Localization('jp'))
         # get skill information from description
         char_skill_df2 = char_skill_df2.groupby(['CharacterId', 'GroupId']).apply(_parse_skill_desc)
         # map column names to english
@@ -283,78 +530,263 @@ class BAData:
         
         return char_skill_df2
     
-    @functools.cached_property
+    @managed_table
     def currencies(self):
         """Gets the currency table from the repo"""
         # fetch
-        curr_df = _get_game_data(self._url_root + "CurrencyExcelTable.json")
-        # localisation
-        curr_localisation_df = self.combine_localisation("LocalizeEtcExcelTable.json")
-        # join
-        curr_df = curr_df.merge(curr_localisation_df, how='left', left_on='LocalizeEtcId', right_on='Key')
+        curr_df = self._get_game_data(self._url_root, "CurrencyExcelTable.json")
         curr_df = curr_df.rename(columns={"ID": "Id"})
         
         return curr_df
     
-    @functools.cached_property
+    @managed_table
     def items(self):
         """Gets the item table from the repo"""
         # fetch the items table
-        items_df = _get_game_data(self._url_root + "ItemExcelTable.json")
-        # fetch the localisation table
-        items_localisation_df = self.combine_localisation("LocalizeEtcExcelTable.json")
-        # join the localisation table
-        items_df = items_df.merge(items_localisation_df, how='left', left_on='LocalizeEtcId', right_on='Key')
+        items_df = self._get_game_data(self._url_root, "ItemExcelTable.json")
         
         return items_df
     
-    @functools.cached_property
+    @managed_table
     def equipment(self):
         """Gets the equipment table from the repo"""
         # fetch tables
-        eq_df = _get_game_data(self._url_root + "EquipmentExcelTable.json")
-        eq_stats_df = _get_game_data(self._url_root + "EquipmentStatExcelTable.json")
-        eq_localisation_df = self.combine_localisation("LocalizeEtcExcelTable.json")
+        eq_df = self._get_game_data(self._url_root, "EquipmentExcelTable.json")
+        eq_stats_df = self._get_game_data(self._url_root, "EquipmentStatExcelTable.json")
         # join
         eq_df = eq_df.merge(eq_stats_df, how='left', left_on='Id', right_on='EquipmentId', suffixes=[None, '_dupe'])
-        eq_df = eq_df.merge(eq_localisation_df, how='left', left_on='LocalizeEtcId', right_on='Key')
         
         return eq_df
     
-    @functools.cached_property
+    @managed_table
     def furnitures(self):
         """Gets the furniture table from the repo"""
         # fetch
-        furn_df = _get_game_data(self._url_root + "FurnitureExcelTable.json")
-        furn_localisation_df = self.combine_localisation("LocalizeEtcExcelTable.json")
-        # join
-        furn_df = furn_df.merge(furn_localisation_df, how='left', left_on='LocalizeEtcId', right_on='Key')
+        furn_df = self._get_game_data(self._url_root, "FurnitureExcelTable.json")
         
         return furn_df
     
-    @functools.cached_property
+    @managed_table
     def recipes(self):
         """Gets the recipe table"""
         # fetch tables
-        recipe_df = _get_game_data(self._url_root + "RecipeExcelTable.json")
-        ingredient_df = _get_game_data(self._url_root + "RecipeIngredientExcelTable.json")
+        recipe_df = self._get_game_data(self._url_root, "RecipeExcelTable.json")
         #join
-        recipe_df = recipe_df.merge(ingredient_df, how='left', left_on='RecipeIngredientId', right_on='Id', suffixes=[None, '_dupe'])
+        recipe_df = recipe_df.merge(self.recipe_ingredients, how='left', left_on='RecipeIngredientId', right_on='Id', suffixes=[None, '_dupe'])
         
         return recipe_df
     
-    @functools.cached_property
+    @managed_table
+    def recipe_ingredients(self):
+        """Gets the recipe ingredient table, also used for skill level up materials"""
+        return self._get_game_data(self._url_root, "RecipeIngredientExcelTable.json")
+    
+    @managed_table
+    def parcel_index(self):
+        """Gets the entry of every item, equipment, currency and furniture by (ParcelType, ParcelId)"""
+        keep_cols = ['ParcelId', 'Rarity', 'Icon', 'LocalizeEtcId']
+        parcel_df = pd.concat([getattr(self, resource).rename(columns={'Id': 'ParcelId'}).filter(items=keep_cols).assign(ParcelType=parcel_type)
+                               for resource, parcel_type in asset_parcel_type_map.items()], ignore_index=True)
+        
+        return parcel_df
+    
+    @managed_table
+    def recipe_parcels(self):
+        """Expands the yield, cost and ingredient parcels of every recipe into rows, joined with their entries"""
+        parcels_df = _explode_parcels(self.recipes, recipe_component_map)
+        # resolve every parcel in one join
+        parcels_df = parcels_df.merge(self.parcel_index, how='left', on=['ParcelType', 'ParcelId'])
+        parcels_df.fillna({'Rarity': '', 'Icon': ''}, inplace=True)
+        
+        return parcels_df
+    
+    @managed_table
+    def used_by_index(self):
+        """Builds the reverse index from (ParcelType, ParcelId) to the recipes, characters, UEs and skills that use it"""
+        index = defaultdict(lambda: {category: [] for category in used_by_categories})
+        
+        # recipes that take the parcel as a cost or an ingredient
+        consumed_df = self.recipe_parcels[self.recipe_parcels.Component != 'Yield'][['Id', 'Component', 'ParcelType', 'ParcelId', 'Amount']]
+        for r in consumed_df.to_dict(orient='records'):
+            index[(r['ParcelType'], r['ParcelId'])]['Recipes'].append({'RecipeId': r['Id'], 'Component': r['Component'], 'Amount': r['Amount']})
+        
+        # characters whose eleph or character pieces are the item
+        cd = self.character_details
+        for col in ('SecretStoneItemId', 'CharacterPieceItemId'):
+            used_df = cd[cd[col] > 0]
+            for c_id, item_id in zip(used_df.CharacterId.tolist(), used_df[col].tolist()):
+                index[('Item', item_id)]['Characters'].append({'CharacterId': c_id, 'Field': col})
+        
+        # UEs whose recipe needs the parcel
+        weapon_df = self.character_weapon[['CharacterId', 'RecipeId']].merge(consumed_df, left_on='RecipeId', right_on='Id')
+        for r in weapon_df.to_dict(orient='records'):
+            index[(r['ParcelType'], r['ParcelId'])]['Weapons'].append({'CharacterId': r['CharacterId'], 'RecipeId': r['RecipeId'], 'Amount': r['Amount']})
+        
+        # skill levels that need the parcel to level up
+        material_df = _explode_parcels(self.recipe_ingredients, {k: v for k, v in recipe_component_map.items() if k != 'Yield'})
+        skill_df = self.character_skills[['CharacterId', 'GroupId', 'Level', 'RequireLevelUpMaterial']].drop_duplicates()\
+                                        .merge(material_df, left_on='RequireLevelUpMaterial', right_on='Id')
+        for r in skill_df.to_dict(orient='records'):
+            index[(r['ParcelType'], r['ParcelId'])]['Skills'].append({'CharacterId': r['CharacterId'], 'GroupId': r['GroupId'], 'Level': r['Level'], 'Amount': r['Amount']})
+        
+        return dict(index)
+    
+    def get_used_by(self, resource, idee):
+        """Gets everything that uses an asset
+        
+        :param resource: the asset name (items, equipment, currencies, furnitures)
+        :param idee: the ID of the asset
+        :return dict: lists of recipes, characters, UEs and skills that use the asset
+        :raises KeyError: if the resource isn't an asset
+        """
+        parcel_type = asset_parcel_type_map[resource]
+        
+        return self.used_by_index.get((parcel_type, idee), {category: [] for category in used_by_categories})
+    
+    @managed_table
     def student_names(self):
         """Gets student names and their associated IDs from the repo"""
         cd = self.character_details
         students = cd[cd.IsPlayableCharacter & (cd.ProductionStep=='Release')]
 
-        return students[['CharacterId', 'DevName', 'BackupName'] + Localization.all_langs().localize('Name')]
+        return students[['CharacterId', 'DevName', 'BackupName', 'LocalizeEtcId']]
     
-    @functools.cached_property
+    @managed_table
     def character_names(self):
         """Gets all character names with the correct student names"""
-        return self.character_details[['CharacterId', 'DevName', 'BackupName'] + Localization.all_langs().localize('Name')]
+        return self.character_details[['CharacterId', 'DevName', 'BackupName', 'LocalizeEtcId']]
+    
+    @managed_table
+    def character_records(self):
+        """Converts every character into records of plain Python types, served without going through pandas"""
+        return build_character_records(self)
+    
+    @managed_table
+    def stats_engine(self):
+        """Builds the stat arrays used to compute final character stats"""
+        return StatsEngine(self.character_stats, self.character_weapon, self.character_bond_stats)
+    
+    def compute_stats(self, char_ids, level=[1], star_grade=[1], bond_level=[1], ue_level=[0], terrain=[None],
+                      max_combinations=max_stat_combinations):
+        """Computes final stats for every combination of the given characters and configurations
+        
+        :param char_ids: list of character IDs
+        :param level: list of character levels
+        :param star_grade: list of star grades
+        :param bond_level: list of bond levels
+        :param ue_level: list of UE levels, 0 for no UE
+        :param terrain: list of terrains (Urban, Outdoor, Indoor), None for no terrain
+        :param max_combinations: most combinations to compute, more raise a ValueError
+        :return dict: list of computed stats for each configuration, indexed by character ID
+        """
+        # cartesian product of every parameter
+        params = (char_ids, level, star_grade, bond_level, ue_level, terrain)
+        if (combinations := math.prod(map(len, params))) > max_combinations:
+            raise ValueError(f'{combinations} combinations requested, at most {max_combinations} are allowed')
+        grid = np.meshgrid(*[np.arange(len(p)) for p in params], indexing='ij')
+        columns = [np.asarray(p)[g.ravel()] for p, g in zip(params, grid)]
+        
+        computed = self.stats_engine.compute(*columns)
+        
+        stats_dict = {}
+        for record in computed.to_dict(orient='records'):
+            stats_dict.setdefault(record.pop('CharacterId'), []).append(record)
+        
+        return stats_dict
+    
+    @managed_table
+    def stat_ranking(self):
+        """Builds the presorted indexes used to rank characters by their stats and UE stats"""
+        return StatRanking(self.character_stats, self.character_weapon)
+    
+    def rank_characters(self, stat, char_ids=None, top=10, ascending=False, lang=Localization('en')):
+        """Ranks characters by one of their stats
+        
+        :param stat: the stat to rank by, UE stats are prefixed with Weapon (e.g. WeaponAttackPower100)
+        :param char_ids: list of character IDs to rank, None for all characters
+        :param top: number of characters to return
+        :param ascending: rank the lowest values first
+        :param lang: the localisation languages of the names
+        :return list: rank, ID, names and stat value of the top characters, best first
+        """
+        ranked = self.stat_ranking.rank(stat, char_ids, top, ascending)
+        if not ranked:
+            return []
+        
+        ids, values = zip(*ranked)
+        names_df = self.character_names.drop_duplicates(subset='CharacterId').set_index('CharacterId').loc[list(ids)].reset_index()
+        names_df = self.etc_localisation.attach(names_df, 'LocalizeEtcId', ['Name'], lang)
+        names = names_df[['CharacterId', 'DevName'] + lang.localize('Name')].to_dict(orient='records')
+        
+        return [{'Rank': rank, **name, stat: value} for rank, (name, value) in enumerate(zip(names, values), start=1)]
+    
+    @managed_table
+    def search_index(self):
+        """Builds the full-text index over localised skill, item, equipment, furniture and currency text"""
+        all_langs = Localization.all_langs()
+        keep_cols = ['Id'] + all_langs.localize('Name', 'Description')
+        # one entry per skill, taking the text of its highest level
+        skills = self.character_skills.dropna(subset=['Id']).sort_values('Level')\
+                                      .drop_duplicates(subset='GroupId', keep='last')\
+                                      .astype({'Id': int})
+        sources = [
+            ('skills', self.skill_localisation.attach(skills, 'LocalizeSkillId', ['Name', 'Description'], all_langs))
+        ]
+        for resource in ('items', 'equipment', 'furnitures', 'currencies'):
+            sources.append((resource, self.etc_localisation.attach(getattr(self, resource), 'LocalizeEtcId', ['Name', 'Description'], all_langs)))
+        
+        return SearchIndex([(resource, df.filter(items=keep_cols)) for resource, df in sources])
+    
+    @managed_table
+    def row_hashes(self):
+        """Hashes the content of every row of the exposed tables, including their localised text"""
+        all_langs = Localization.all_langs()
+        
+        characters = self.character_details.merge(self.character_stats, how='left', on='CharacterId', suffixes=[None, '_dupe'])
+        skills = self.character_skills.drop_duplicates(subset=['GroupId', 'Level']).dropna(subset=['Id']).astype({'Id': int})
+        
+        tables = {
+            'characters': (self.etc_localisation.attach(characters, 'LocalizeEtcId', ['Name'], all_langs), 'CharacterId'),
+            'skills': (self.skill_localisation.attach(skills, 'LocalizeSkillId', ['Name', 'Description'], all_langs), 'Id'),
+            'recipes': (self.recipes, 'Id')
+        }
+        for resource in ('items', 'equipment', 'currencies', 'furnitures'):
+            tables[resource] = (self.etc_localisation.attach(getattr(self, resource), 'LocalizeEtcId', ['Name', 'Description'], all_langs), 'Id')
+        
+        return {resource: hash_rows(df, id_col) for resource, (df, id_col) in tables.items()}
+    
+    @managed_table
+    def region_diff(self):
+        """Compares the JP and global localisation tables, keys only in JP are added and keys only in global are removed"""
+        diff = {}
+        for table_name, key in (("LocalizeEtcExcelTable.json", 'Key'), ("LocalizeSkillExcelTable.json", 'Key'), 
+                                ("LocalizeCharProfileExcelTable.json", 'CharacterId')):
+            loc_jp = self._get_game_data(self._url_root, table_name)
+            loc_gl = self._get_game_data(self._url_global_root, table_name)
+            # only compare the text both clients have
+            common_cols = sorted((set(loc_jp.columns) & set(loc_gl.columns)) - {key})
+            if common_cols:
+                diff[table_name.replace('ExcelTable.json', '')] = diff_hashes(hash_rows(loc_gl[[key] + common_cols], key), 
+                                                                              hash_rows(loc_jp[[key] + common_cols], key))
+            else:
+                # no text in common, only the keys can be compared
+                keys_jp = pd.Index(loc_jp[key].unique())
+                keys_gl = pd.Index(loc_gl[key].unique())
+                diff[table_name.replace('ExcelTable.json', '')] = {'Added': keys_jp.difference(keys_gl).tolist(),
+                                                                   'Removed': keys_gl.difference(keys_jp).tolist()}
+        
+        return diff
+    
+    def search(self, query, resources=None, lang=Localization('en'), limit=20):
+        """Searches localised names and descriptions of assets
+        
+        :param query: the text to search for
+        :param resources: asset names to restrict the search to, None for all
+        :param lang: the localisation languages to search in
+        :param limit: maximum number of results
+        :return list: ranked list of matching assets
+        """
+        return self.search_index.search(query, resources, lang, limit)
     
     def list_characters(self, substr='', student_only=True, lang=Localization('en')):
         """Lists all unit names
@@ -366,11 +798,28 @@ class BAData:
         
         # check for containing substring
         if substr:
-            mask = names_df.filter(like='Name', axis=1).apply(lambda r: r.str.contains(substr, case=False).any(), axis=1)
+            all_names_df = self.etc_localisation.attach(names_df, 'LocalizeEtcId', ['Name'], Localization.all_langs())
+            mask = all_names_df.filter(like='Name', axis=1).apply(lambda r: r.str.contains(substr, case=False).any(), axis=1)
             names_df = names_df[mask]
         
+        names_df = self.etc_localisation.attach(names_df, 'LocalizeEtcId', ['Name'], lang)
         return names_df.set_index('CharacterId')[['DevName', 'BackupName'] + lang.localize('Name')].to_dict(orient='index')
     
+    def _attach_lookup_text(self, df, lookup_key, localisation, key_col):
+        """Adds the localised columns used as lookup keys (e.g. NameEn), which only live in the localisation store
+        
+        :param df: the table to filter
+        :param lookup_key: list of lookup keys
+        :param localisation: the LocalisationStore holding the text of the table
+        :param key_col: column of the table holding the localisation keys
+        :return DataFrame: the table with the localised lookup columns added
+        """
+        for column in set(lookup_key) - set(df.columns):
+            if (split := localisation.split_column(column)) is not None:
+                df = localisation.attach(df, key_col, [split[0]], Localization(split[1]))
+        
+        return df
+    
     def find_character(self, lookup_key=[], lookup_value=[], student_only=True, lang=Localization('en')):
         """Creates a Character object based on the lookup key
         
@@ -389,6 +838,8 @@ class BAData:
             if isinstance(lookup_key, str):
                 lookup_key = [lookup_key]
                 lookup_value = [lookup_value]
+            # names can be looked up too
+            details_df = self._attach_lookup_text(details_df, lookup_key, self.etc_localisation, 'LocalizeEtcId')
 
             # filter by magic
             if (lookup_zip := list(filter(lambda k: k[0] in details_df.columns, zip(lookup_key, lookup_value)))):
@@ -402,22 +853,32 @@ class BAData:
         
         return selected_ids
     
-    def _get_generic_asset(self, asset, lookup_key=[], lookup_value=[], keep_cols=None, localize_cols=[], lang=Localization('en'), index='Id'):
-        """Gets a generic asset (item, currency, equipment, furniture) by a lookup key"""
+    def _get_generic_asset(self, asset, lookup_key=[], lookup_value=[], keep_cols=None, localize_cols=[], lang=Localization('en'), index='Id',
+                           localisation=None, localize_key='LocalizeEtcId'):
+        """Gets a generic asset (item, currency, equipment, furniture) by a lookup key, with its localised text pulled from the localisation store"""
         # combine column filters
         if keep_cols is None:
             # keep all by default
             keep_cols = list(asset.columns)
         filter_cols = set((order_cols := keep_cols + lang.localize(*localize_cols)))
         
+        def localize(df):
+            # only look up text for the selected rows and languages
+            if localize_cols:
+                df = (localisation or self.etc_localisation).attach(df, localize_key, localize_cols, lang)
+            return df.filter(items=filter_cols)[order_cols].set_index(index).to_dict(orient='index')
+        
         if not lookup_key and not lookup_value:
             # return entire asset
-            return asset.filter(items=filter_cols)[order_cols].set_index(index).to_dict(orient='index')
+            return localize(asset)
         
         # make into lists if not already
         if isinstance(lookup_key, str):
             lookup_key = [lookup_key]
             lookup_value = [lookup_value]
+        # localised text can be looked up too
+        if localize_cols:
+            asset = self._attach_lookup_text(asset, lookup_key, localisation or self.etc_localisation, localize_key)
             
         # filter by magic
         if (lookup_zip := list(filter(lambda k: k[0] in asset.columns, zip(lookup_key, lookup_value)))):
@@ -426,7 +887,7 @@ class BAData:
             return {}
         
         mask = functools.reduce(logical_and, [asset[k].isin(v) for k,v in zip(lookup_key, lookup_value)])
-        return asset.filter(items=filter_cols)[mask][order_cols].set_index(index).to_dict(orient='index')
+        return localize(asset[mask])
     
     def get_skill(self, lookup_key=[], lookup_value=[], lang=Localization('en')):
         """Gets recipe by ID and looks up parcels involved in it
@@ -436,47 +897,33 @@ class BAData:
         :return dict: dictionary of recipe data
         """
         skills_clean = self.character_skills.drop_duplicates(subset=['GroupId', 'Level'])
-        return self._get_generic_asset(skills_clean, lookup_key, lookup_value, skill_keep_keys, ['Name', 'Description'], lang)
+        return self._get_generic_asset(skills_clean, lookup_key, lookup_value, skill_keep_keys, ['Name', 'Description'], lang,
+                                       localisation=self.skill_localisation, localize_key='LocalizeSkillId')
     
     def get_recipe(self, lookup_key=[], lookup_value=[], lang=Localization('en')):
-        """Gets recipe by ID and looks up parcels involved in it
+        """Gets recipe by ID along with the resolved yield, cost and ingredient parcels
         
         :param lookup: the ID to look up recipe by
         :param lang: the localisation language to use
         :return dict: dictionary of recipe data
         """
         
-        return self._get_generic_asset(self.recipes, lookup_key, lookup_value, recipe_keep_keys, lang=lang)
-    
-        rcps = self._get_generic_asset(self.recipes, lookup, recipe_keep_keys, lang=lang)
-        recipe_list = []
-        for recipe in rcps:
-            # initialise return dict
-            recipe_dict = {
-                "Id": recipe['Id'],
-                "Type": recipe['RecipeType'],
-                "CostTimeInSecond": recipe['CostTimeInSecond'],
-            }
-            # process the components
-            # yield
-            recipe_yield = self._get_parcel(recipe['ParcelType'], recipe['ParcelId'], recipe['ResultAmountMax'], lang)
-            # add the appropriate keys
-            recipe_dict["Yield"] = recipe_yield
-            # cost
-            if not isinstance(recipe['CostParcelType'], list):
-                recipe_dict["Cost"] = {}
-            else:
-                recipe_cost = self._get_parcel(recipe['CostParcelType'], recipe['CostId'], recipe['CostAmount'], lang)
-                recipe_dict["Cost"] = recipe_cost
-            # ingredient
-            if not isinstance(recipe['IngredientParcelType'], list):
-                recipe_dict["Ingredient"] = {}
-            else:
-                recipe_ingredient = self._get_parcel(recipe['IngredientParcelType'], recipe['IngredientId'], recipe['IngredientAmount'], lang)
-                recipe_dict["Ingredient"] = recipe_ingredient
-            recipe_list.append(recipe_dict)
+        recipe_dict = self._get_generic_asset(self.recipes, lookup_key, lookup_value, recipe_keep_keys, lang=lang)
+        
+        # initialise the parcel lists of every recipe
+        for recipe in recipe_dict.values():
+            for component in recipe_component_map:
+                recipe[component] = []
+        
+        # pick the resolved parcels of the selected recipes
+        parcels_df = self.recipe_parcels
+        parcels_df = parcels_df[parcels_df.Id.isin(list(recipe_dict))]
+        parcels_df = self.etc_localisation.attach(parcels_df, 'LocalizeEtcId', ['Name'], lang)
+        keep_cols = ['Id', 'Component'] + parcel_keep_keys + lang.localize('Name')
+        for parcel in parcels_df[keep_cols].to_dict(orient='records'):
+            recipe_dict[parcel.pop('Id')][parcel.pop('Component')].append(parcel)
         
-        return recipe_list
+        return recipe_dict
     
     def get_item(self, lookup_key=[], lookup_value=[], lang=Localization('en')):
         """Gets item by ID and returns a dict of its data
@@ -541,7 +988,9 @@ class BACharacter():
         return summary_dict
     
     def basic_info(self):
-        return self._master.character_details.set_index('CharacterId').loc[self._id][self.lang.localize('Name') + info_keep_keys].to_dict()
+        info = self._master.character_details.set_index('CharacterId').loc[self._id]
+        names = self._master.etc_localisation.get(info.LocalizeEtcId, ['Name'], self.lang)
+        return {**names, **info[info_keep_keys].to_dict()}
     
     def stats(self):
         return self._master.character_stats.set_index('CharacterId').loc[self._id].to_dict()
@@ -554,7 +1003,9 @@ class BACharacter():
             skill_df = self._master.character_skills.set_index('CharacterId').loc[self._id]
             if isinstance(skill_df, pd.Series):
                 skill_df = skill_df.to_frame().transpose()
-            skill_df = skill_df.drop_duplicates(subset=['GroupId', 'Level']).set_index(['GroupId', 'Level'])
+            skill_df = skill_df.drop_duplicates(subset=['GroupId', 'Level'])
+            skill_df = self._master.skill_localisation.attach(skill_df, 'LocalizeSkillId', ['Name', 'Description'], self.lang)\
+                                                      .set_index(['GroupId', 'Level'])
         except KeyError:
             return {}
         
@@ -585,8 +1036,8 @@ class BACharacter():
         if not self.is_student:
             return {}
         elif self.is_student:
-            return self._master.character_profiles.set_index('CharacterId')\
-                        .loc[self._id][['BirthDay'] + self.lang.localize(*profile_localize_keys)].to_dict()
+            profile = self._master.character_profiles.set_index('CharacterId').loc[self._id]
+            return {'BirthDay': profile.BirthDay, **self._master.profile_localisation.get(self._id, profile_localize_keys, self.lang)}
         
     def weapon(self):
         if not self.is_student:
@@ -628,6 +1079,7 @@ class BACharacter():
 if __name__ == "__main__":
 
     bad = BAData()
+    bad.load()
 
     b = BACharacter(bad, 10000, lang=Localization('en', 'jp'))
     
@@ -0,0 +1,198 @@
+import numpy as np
+
+from badapi.constants import *
+from badapi.localization import Localization
+
+
+def _native(value):
+    """Converts numpy scalars and arrays, also inside lists and dictionaries, to plain Python types"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return [_native(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_native(v) for v in value]
+    if isinstance(value, dict):
+        return {_native(k): _native(v) for k, v in value.items()}
+
+    return value
+
+
+def _localised(df, key, fields, langs):
+    """Splits the <Field><Lang> columns of a table into per language dictionaries, indexed by key"""
+    return {k: {l: {f + l: text[f + l] for f in fields} for l in langs}
+            for k, text in df.set_index(key)[[f + l for l in langs for f in fields]].to_dict(orient='index').items()}
+
+
+class SkillRecord:
+    __slots__ = ('group_id', 'min_weapon_tier', 'category', 'levels')
+
+    def __init__(self, group_id, min_weapon_tier, category, levels):
+        """ One skill of a character
+
+        :param group_id: the skill group ID
+        :param min_weapon_tier: UE tier the skill needs
+        :param category: EX, Normal, Passive or Sub
+        :param levels: tuple of (level, level up materials, localised text by language)
+        """
+        self.group_id = group_id
+        self.min_weapon_tier = min_weapon_tier
+        self.category = category
+        self.levels = levels
+
+    def serialize(self, lang):
+        levels = {}
+        for level, materials, text in self.levels:
+            entry = {}
+            for l in lang.lang:
+                entry.update(text[l])
+            entry['RequireLevelUpMaterial'] = materials
+            levels[level] = entry
+
+        return {'MinimumWeaponTier': self.min_weapon_tier, 'SkillCategory': self.category, 'Levels': levels}
+
+
+class CharacterRecord:
+    __slots__ = ('id', 'is_student', 'names', 'info', 'stats', 'details', 'birthday', 'profile_text',
+                 'skills', 'skill_details', 'weapon', 'weapon_passive', 'bond')
+
+    def __init__(self, char_id, is_student):
+        """ Everything served about a character, converted once to plain Python types
+
+        Localised text is held for every language and picked when serialising, so serving never touches pandas.
+
+        :param char_id: the character ID
+        :param is_student: whether the character is a released student
+        """
+        self.id = char_id
+        self.is_student = is_student
+        self.names = {}
+        self.info = {}
+        self.stats = {}
+        self.details = {}
+        self.birthday = None
+        self.profile_text = {}
+        self.skills = ()
+        self.skill_details = {}
+        self.weapon = {}
+        self.weapon_passive = {}
+        self.bond = {}
+
+    def serialize(self, resource=None, lang=Localization('en')):
+        """Builds the response for one of the character resources, same as the BACharacter methods
+
+        :param resource: one of character_resources, None for the summary
+        :param lang: the localisation languages
+        :return dict: the response data
+        """
+        if resource is None:
+            summary = self.serialize('info', lang)
+            for info, key in (('stats', 'Stats'), ('details', 'Details'), ('profile', 'Profile'), ('skills', 'Skills'),
+                              ('skill_details', 'SkillDetails'), ('weapon', 'Weapon'), ('weapon_passive', 'WeaponPassive'),
+                              ('bond', 'BondStats')):
+                summary[key] = self.serialize(info, lang)
+            return summary
+
+        if resource == 'info':
+            info = {}
+            for l in lang.lang:
+                info.update(self.names[l])
+            info.update(self.info)
+            return info
+        if resource == 'profile':
+            if not self.is_student:
+                return {}
+            profile = {'BirthDay': self.birthday}
+            for l in lang.lang:
+                profile.update(self.profile_text.get(l, {}))
+            return profile
+        if resource == 'skills':
+            return {skill.group_id: skill.serialize(lang) for skill in self.skills}
+        if resource in ('weapon', 'weapon_passive', 'bond') and not self.is_student:
+            return {}
+
+        return getattr(self, resource)
+
+
+class CharacterRecords(dict):
+    def __init__(self, records):
+        """ CharacterRecord indexed by character ID, in character table order
+
+        :param records: dictionary of character ID to CharacterRecord
+        """
+        super().__init__(records)
+        # released students, what the character lookup returns by default
+        self.student_ids = [c_id for c_id, record in records.items() if record.is_student]
+
+
+def build_character_records(master):
+    """Converts every character of a BAData instance into records
+
+    :param master: the BAData instance
+    :return CharacterRecords: CharacterRecord indexed by character ID
+    """
+    all_langs = Localization.all_langs()
+    langs = sorted(all_langs.lang)
+
+    details = master.character_details.drop_duplicates(subset='CharacterId')
+    student_ids = set(master.student_names.CharacterId.tolist())
+    records = {c_id: CharacterRecord(c_id, c_id in student_ids) for c_id in _native(details.CharacterId.to_numpy())}
+
+    # basic info and details
+    names = _localised(master.etc_localisation.attach(details, 'LocalizeEtcId', ['Name'], all_langs), 'CharacterId', ['Name'], langs)
+    details = details.set_index('CharacterId')
+    for c_id, info in details[info_keep_keys].to_dict(orient='index').items():
+        records[c_id].names = names[c_id]
+        records[c_id].info = _native(info)
+    for c_id, extra in details[details_keep_keys].to_dict(orient='index').items():
+        records[c_id].details = _native(extra)
+
+    # stats, weapon and profile, one row per character
+    for c_id, stats in master.character_stats.drop_duplicates(subset='CharacterId').set_index('CharacterId').to_dict(orient='index').items():
+        if c_id in records:
+            records[c_id].stats = _native(stats)
+    weapons = master.character_weapon.drop_duplicates(subset='CharacterId').set_index('CharacterId')
+    for c_id, weapon in weapons[weapon_keep_keys].to_dict(orient='index').items():
+        if c_id in records:
+            records[c_id].weapon = _native(weapon)
+    profiles = master.character_profiles.drop_duplicates(subset='CharacterId')
+    profile_text = _localised(master.profile_localisation.attach(profiles, 'CharacterId', profile_localize_keys, all_langs),
+                              'CharacterId', profile_localize_keys, langs)
+    for c_id, birthday in profiles.set_index('CharacterId').BirthDay.items():
+        if c_id in records:
+            records[c_id].birthday = _native(birthday)
+            records[c_id].profile_text = profile_text[c_id]
+
+    # skills, text of every level in every language
+    skills = master.character_skills.drop_duplicates(subset=['CharacterId', 'GroupId', 'Level'])
+    skills = master.skill_localisation.attach(skills, 'LocalizeSkillId', ['Name', 'Description'], all_langs)
+    for c_id, char_skills in skills.groupby('CharacterId'):
+        if c_id not in records:
+            continue
+        skill_records = []
+        for group, df in char_skills.groupby('GroupId'):
+            levels = tuple((_native(level), _native(row['RequireLevelUpMaterial']),
+                            {l: {'Name' + l: row['Name' + l], 'Description' + l: row['Description' + l]} for l in langs})
+                           for level, row in zip(df.Level.tolist(), df.to_dict(orient='records')))
+            skill_records.append(SkillRecord(group, _native(df.MinimumGradeCharacterWeapon.iloc[0]), df.SkillCategory.iloc[0], levels))
+        records[_native(c_id)].skills = tuple(skill_records)
+
+    # parsed skill values, indexed by (character, skill group, effect)
+    for (c_id, group, effect), values in master.character_skill_details.to_dict(orient='index').items():
+        if c_id in records:
+            records[c_id].skill_details.setdefault(group, {})[_native(effect)] = _native(values)
+
+    # UE passive and bond stats, one row per level
+    for c_id, df in master.weapon_passive_bonuses.groupby(level=0):
+        if c_id in records:
+            passive = _native(df.to_dict(orient='list'))
+            passive['WeaponPassiveStatName'] = passive['WeaponPassiveStatName'][0]
+            records[c_id].weapon_passive = passive
+    for c_id, df in master.character_bond_stats.groupby('CharacterId'):
+        if c_id in records:
+            bond = _native(df.drop(columns='CharacterId').set_index('Level').to_dict(orient='list'))
+            bond['Stat1'] = bond['Stat1'][0]
+            bond['Stat2'] = bond['Stat2'][0]
+            records[c_id].bond = bond
+
+    return CharacterRecords(records)
@@ -0,0 +1,351 @@
+import math
+from flask import Blueprint, Response, abort, current_app, request
+from flask import json as flask_json
+from badapi.cache import cache_key, coding_preference
+from badapi.constants import asset_parcel_type_map, asset_resources, character_resources, max_stat_combinations
+from badapi.localization import Localization
+from badapi.helper import to_possible_types
+
+bp = Blueprint('badapi', __name__)
+
+# query parameter and header selecting the dataset
+dataset_arg = 'dataset'
+dataset_header = 'X-Dataset'
+
+def _selected_state():
+    registry = current_app.extensions['badapi']
+    name = request.args.get(dataset_arg) or request.headers.get(dataset_header) or registry.default
+    
+    return registry.datasets.get(name)
+
+def _state():
+    if (state := _selected_state()) is None:
+        abort(404, f'Unknown dataset, pick one of {", ".join(current_app.extensions["badapi"].datasets)}')
+    
+    return state
+
+def _is_full_dump():
+    """Whether the request is for a full dump, served from the response cache in every content coding"""
+    return request.endpoint in ('badapi.fetch_characters', 'badapi.fetch_resource') and request.view_args.get('idee') is None
+
+def _not_modified():
+    response = Response(status=304)
+    if _is_full_dump():
+        # same as the full response
+        response.vary.add('Accept-Encoding')
+    
+    return response
+
+@bp.before_app_request
+def check_data_version():
+    """Holds requests until the data is loaded, then answers conditional requests with 304 before doing any lookup work"""
+    if request.endpoint in ('badapi.index', 'badapi.ready'):
+        return
+    # unknown URLs get their 404 whatever the validators
+    if request.endpoint is None or request.routing_exception is not None:
+        return
+    
+    state = _state()
+    if not state.ready:
+        return Response('Data is not loaded yet', status=503, headers={'Retry-After': '5'})
+    
+    if request.if_none_match:
+        if request.if_none_match.contains_weak(state.data.response_version):
+            return _not_modified()
+    elif request.if_modified_since and state.data.version_seen_at and request.if_modified_since >= state.data.version_seen_at:
+        return _not_modified()
+
+@bp.after_app_request
+def add_cache_headers(response):
+    """Attaches validators derived from the data version to every response"""
+    state = _selected_state()
+    if response.status_code in (200, 304) and state is not None and state.ready and request.endpoint != 'badapi.ready':
+        # weak since the same data can be sent with different content codings
+        response.set_etag(state.data.response_version, weak=True)
+        if state.data.version_seen_at is not None:
+            response.last_modified = state.data.version_seen_at
+        response.cache_control.public = True
+        response.cache_control.max_age = state.config.get('cache_max_age', 300)
+        response.vary.add(dataset_header)
+    
+    return response
+
+def cached_response(build):
+    """Serves a precompressed body from the response cache, building and compressing it on a miss
+    
+    :param build: callable that returns the response data
+    :return Response: the body in the best content coding the client accepts
+    """
+    state = _state()
+    version = state.data.data_version
+    key = cache_key(request.path, request.args)
+    entry = state.response_cache.get(key, version)
+    if entry is None:
+        # concurrent misses for the same dump build and compress it only once
+        entry = state.single_flight.do(('dump', version, key),
+                                       lambda: state.response_cache.put(key, version, (flask_json.dumps(build()) + '\n').encode()))
+    
+    coding = request.accept_encodings.best_match([c for c in coding_preference if c in entry], default='identity')
+    response = Response(entry[coding], mimetype='application/json')
+    if coding != 'identity':
+        response.content_encoding = coding
+    response.vary.add('Accept-Encoding')
+    
+    return response
+
+def coalesced_response(build):
+    """Serialises the response data, sharing the work between identical requests that arrive while it is being built
+    
+    :param build: callable that returns the response data
+    :return Response: the JSON body
+    """
+    state = _state()
+    key = ('json', state.data.data_version, cache_key(request.path, request.args))
+    body = state.single_flight.do(key, lambda: (flask_json.dumps(build()) + '\n').encode())
+    
+    return Response(body, mimetype='application/json')
+
+@bp.route('/')
+def index():
+    return 'You are on the index page. Shoo.'
+
+@bp.route('/ready')
+def ready():
+    
+    state = _state()
+    if state.ready:
+        return {'Dataset': state.name, 'Ready': True, 'Version': state.data.data_version, 'Attempts': state.attempts}
+    
+    # retrying unless every attempt failed
+    return {'Dataset': state.name, 'Ready': False, 'Error': state.error, 'Attempts': state.attempts, 'Retrying': not state.finished}, 503
+
+@bp.route('/characters/phonebook')
+def list_characters():
+    
+    bad = _state().data
+    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
+    contains = request.args.get('name_contains', '')
+    lang = Localization(*request.args.getlist('lang'))
+    
+    return coalesced_response(lambda: bad.list_characters(substr=contains, student_only=stonly, lang=lang))
+
+@bp.route('/search')
+def search():
+    
+    bad = _state().data
+    query = request.args.get('q', '')
+    resources = request.args.getlist('resource')
+    limit = request.args.get('limit', default=20, type=int)
+    lang = Localization(*request.args.getlist('lang'))
+    
+    return coalesced_response(lambda: {'Query': query, 'Results': bad.search(query, resources=resources, lang=lang, limit=limit)})
+
+def lookup_args(skip):
+    """Gets field filters from the query string, ignoring the given parameters
+    
+    :param skip: query parameters that aren't filters
+    :return tuple: list of lookup keys and list of lists of lookup values
+    """
+    lkey = []
+    lvalue = []
+    for arg, val in request.args.lists():
+        if arg in skip or arg == dataset_arg:
+            continue
+        lkey.append(arg)
+        lvalue.append(list(map(to_possible_types, val)))
+    
+    return lkey, lvalue
+
+@bp.route('/changes')
+def list_changes():
+    
+    bad = _state().data
+    if request.args.get('mode') == 'regions':
+        return coalesced_response(lambda: bad.region_diff)
+    
+    change_history = _state().change_history
+    since = request.args.get('since', bad.response_version)
+    
+    def build():
+        # the ETag of an earlier response, its data version is all that matters
+        changes = change_history.changes(since.partition('-')[0], bad.data_version)
+        if changes is None:
+            # too old or unknown, the client needs to download everything again
+            abort(410)
+        return {'Since': since, 'Version': bad.response_version, 'Changes': changes}
+    
+    return coalesced_response(build)
+
+@bp.route('/characters/stats/computed')
+def compute_stats():
+    
+    bad = _state().data
+    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
+    config_args = ['id', 'level', 'star_grade', 'bond', 'ue_level', 'terrain']
+    
+    # explicit IDs, or every character matching the filters
+    char_ids = request.args.getlist('id', type=int)
+    if not char_ids:
+        lkey, lvalue = lookup_args(['lang', 'student_only'] + config_args)
+        char_ids = bad.find_character(lkey, lvalue, student_only=stonly)
+    
+    configs = {
+        'level': request.args.getlist('level', type=int) or [1],
+        'star_grade': request.args.getlist('star_grade', type=int) or [1],
+        'bond_level': request.args.getlist('bond', type=int) or [1],
+        'ue_level': request.args.getlist('ue_level', type=int) or [0],
+        'terrain': request.args.getlist('terrain') or [None]
+    }
+    max_combinations = _state().config.get('max_stat_combinations', max_stat_combinations)
+    if (combinations := math.prod(map(len, configs.values())) * len(char_ids)) > max_combinations:
+        abort(400, f'{combinations} combinations requested, at most {max_combinations} are allowed')
+    
+    return coalesced_response(lambda: bad.compute_stats(char_ids, max_combinations=max_combinations, **configs))
+
+@bp.route('/characters/rank')
+def rank_characters():
+    
+    bad = _state().data
+    stat = request.args.get('stat', '')
+    if stat not in bad.stat_ranking.stats:
+        abort(400, f'Unknown stat, pick one of {", ".join(bad.stat_ranking.stats)}')
+    
+    top = request.args.get('top', default=10, type=int)
+    ascending = request.args.get('order', 'desc').lower() == 'asc'
+    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
+    lang = Localization(*request.args.getlist('lang'))
+    
+    # same filters as the character lookup
+    lkey, lvalue = lookup_args(['lang', 'student_only', 'stat', 'top', 'order'])
+    
+    def build():
+        char_ids = bad.find_character(lkey, lvalue, student_only=stonly)
+        return bad.rank_characters(stat, char_ids, top=top, ascending=ascending, lang=lang)
+    
+    return coalesced_response(build)
+
+@bp.route('/characters/')
+@bp.route('/characters/<int:idee>/')
+@bp.route('/characters/<int:idee>/<string:resource>')
+def fetch_characters(idee=None, resource=None):
+    
+    if idee is None:
+        # full dumps are served from the response cache
+        return cached_response(lambda: _find_characters(idee, resource))
+    
+    return coalesced_response(lambda: _find_characters(idee, resource))
+
+def _find_characters(idee, resource):
+    
+    bad = _state().data
+    stonly = request.args.get("student_only", default=True, type=lambda v: v.lower() == 'true')
+    lang = Localization(*request.args.getlist('lang'))
+    
+    # get lookup keys
+    lkey = []
+    lvalue = []
+    
+    if idee is None:
+        pass
+    else:
+        lkey.append('CharacterId')
+        lvalue.append([idee])
+        stonly = False
+        
+    for arg, val in request.args.lists():
+        if arg in ['lang', 'student_only', dataset_arg]:
+            continue
+        lkey.append(arg)
+        lvalue.append(list(map(to_possible_types, val)))
+        
+    data = {}
+    if bad.serving_model == 'records':
+        records = bad.character_records
+        if len(lkey) > (idee is not None):
+            characters = bad.find_character(lkey, lvalue, student_only=stonly)
+        elif idee is not None:
+            # plain ID and full dumps don't need pandas at all
+            characters = [idee]
+        else:
+            characters = records.student_ids if stonly else list(records)
+        
+        for c_id in characters:
+            if c_id in records and (resource is None or resource in character_resources):
+                data[c_id] = records[c_id].serialize(resource, lang)
+        return data
+    
+    # imported here so importing the package doesn't pull in pandas
+    from badapi.reader import BACharacter
+    
+    # find characters based on lookup keys
+    characters = bad.find_character(lkey, lvalue, student_only=stonly)
+    for c_id in characters:
+        character = BACharacter(bad, c_id, lang=lang)
+
+        resource_funcs = {
+            'info': character.basic_info,
+            'stats': character.stats,
+            'details': character.details,
+            'profile': character.profile,
+            'skills': character.skills,
+            'skill_details': character.skill_details,
+            'weapon': character.weapon,
+            'weapon_passive': character.weapon_passive,
+            'bond': character.bond
+        }
+    
+        if resource is None:
+            data[c_id] = character.summary()
+        elif resource in resource_funcs.keys():
+            data[c_id] = (resource_funcs[resource])()
+        else:
+            continue
+            
+    return data
+    
+@bp.route(f'/assets/<any({", ".join(asset_resources)}):resource>/')
+@bp.route(f'/assets/<any({", ".join(asset_resources)}):resource>/<int:idee>')
+def fetch_resource(resource=None, idee=None):
+    
+    if idee is None:
+        # full dumps are served from the response cache
+        return cached_response(lambda: _find_resource(resource, idee))
+    
+    return coalesced_response(lambda: _find_resource(resource, idee))
+
+@bp.route(f'/assets/<any({", ".join(asset_parcel_type_map)}):resource>/<int:idee>/used_by')
+def fetch_used_by(resource, idee):
+    
+    bad = _state().data
+    return coalesced_response(lambda: bad.get_used_by(resource, idee))
+
+def _find_resource(resource, idee):
+    
+    bad = _state().data
+    lang = Localization(*request.args.getlist('lang'))
+    
+    resource_funcs = {
+        'skills': bad.get_skill,
+        'items': bad.get_item,
+        'equipment': bad.get_equipment,
+        'currencies': bad.get_currency,
+        'furnitures': bad.get_furniture,
+        'recipes': bad.get_recipe
+    }
+    
+    lkey = []
+    lvalue = []
+    
+    if idee is None:
+        pass
+    else:
+        lkey.append('Id')
+        lvalue.append([idee])
+        
+    for arg, val in request.args.lists():
+        if arg in ['lang', dataset_arg]:
+            continue
+        lkey.append(arg)
+        lvalue.append(list(map(to_possible_types, val)))
+        
+    return (resource_funcs[resource])(lookup_key=lkey, lookup_value=lvalue, lang=lang)
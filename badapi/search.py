@@ -0,0 +1,122 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from badapi.localization import Localization
+
+# strips rich text markup like [c][007eff] from descriptions
+_re_markup = re.compile(r'\[[^\]]*\]')
+# runs of scripts written without spaces (kana, CJK ideographs, hangul, thai) or of latin letters and digits
+_re_token = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af\u0e00-\u0e7f]+)|([0-9a-z\u00c0-\u024f]+)')
+
+# name matches count for more than description matches
+name_weight = 3
+# BM25 parameters
+_k1 = 1.2
+_b = 0.75
+
+
+def tokenize(text, unigrams=False):
+    """Splits text into search tokens, words for latin text and character bigrams for CJK/hangul/thai text
+
+    :param text: the text to tokenize
+    :param unigrams: also add every single character of CJK/hangul/thai text, so one character queries match longer text
+    :return list: list of tokens
+    """
+    if not isinstance(text, str):
+        return []
+    # fold full width characters and case
+    text = unicodedata.normalize('NFKC', _re_markup.sub(' ', text)).lower()
+
+    tokens = []
+    for run, word in _re_token.findall(text):
+        if word:
+            tokens.append(word)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i+2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(run)
+
+    return tokens
+
+
+class SearchIndex:
+    def __init__(self, sources):
+        """ Inverted index over the localised names and descriptions of assets
+
+        :param sources: list of (resource name, DataFrame) with an Id column and localised Name/Description columns
+        """
+        # doc number -> (resource, id)
+        self.docs = []
+        # doc number -> {lang: name}
+        self.names = []
+        # lang -> token -> {doc number: weighted term frequency}
+        self.postings = defaultdict(lambda: defaultdict(dict))
+        # lang -> doc number -> document length
+        self.lengths = defaultdict(dict)
+
+        langs = Localization.all_langs().lang
+        for resource, df in sources:
+            for record in df.to_dict(orient='records'):
+                doc = len(self.docs)
+                self.docs.append((resource, record['Id']))
+                self.names.append({lang: name if isinstance(name := record.get('Name' + lang), str) else '' for lang in langs})
+                for lang in langs:
+                    # queries only use unigrams for single characters, so longer queries still match on bigrams
+                    name_tokens = tokenize(record.get('Name' + lang), unigrams=True)
+                    desc_tokens = tokenize(record.get('Description' + lang), unigrams=True)
+                    if not name_tokens and not desc_tokens:
+                        continue
+                    tf = Counter(desc_tokens)
+                    for token in name_tokens:
+                        tf[token] += name_weight
+                    for token, count in tf.items():
+                        self.postings[lang][token][doc] = count
+                    self.lengths[lang][doc] = name_weight * len(name_tokens) + len(desc_tokens)
+
+        self.avg_lengths = {lang: sum(l.values()) / len(l) for lang, l in self.lengths.items() if l}
+
+    def search(self, query, resources=None, lang=Localization('en'), limit=20):
+        """Ranks documents against a query
+
+        :param query: the search text
+        :param resources: resource names to restrict the search to, None for all
+        :param lang: the localisation languages to search in and return names for
+        :param limit: maximum number of results
+        :return list: ranked list of result dicts
+        """
+        tokens = set(tokenize(query))
+        # distinct query tokens and accumulated score of every matching doc
+        matched = defaultdict(set)
+        scores = defaultdict(float)
+        for l in lang.lang:
+            postings = self.postings.get(l, {})
+            lengths = self.lengths.get(l, {})
+            for token in tokens:
+                docs = postings.get(token)
+                if not docs:
+                    continue
+                idf = math.log(1 + (len(lengths) - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc, tf in docs.items():
+                    norm = _k1 * (1 - _b + _b * lengths[doc] / self.avg_lengths[l])
+                    scores[doc] += idf * tf * (_k1 + 1) / (tf + norm)
+                    matched[doc].add(token)
+
+        if resources:
+            candidates = [doc for doc in scores if self.docs[doc][0] in resources]
+        else:
+            candidates = list(scores)
+        # docs matching more of the query rank first, then by score
+        candidates.sort(key=lambda doc: (len(matched[doc]), scores[doc]), reverse=True)
+
+        results = []
+        for doc in candidates[:limit]:
+            resource, idee = self.docs[doc]
+            result = {'Resource': resource, 'Id': idee, 'Score': round(scores[doc], 4)}
+            result.update({'Name' + l: self.names[doc][l] for l in lang.lang})
+            results.append(result)
+
+        return results
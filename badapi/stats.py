@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from badapi.constants import *
+
+
+def _adaptation_rank(values):
+    """Converts mood ranks to their position in adaptation_ranks, -1 when unknown"""
+    rank_index = {rank: i for i, rank in enumerate(adaptation_ranks)}
+    # ranks are numbered the same way in the game data
+    rank_index.update({i: i for i in range(len(adaptation_ranks))})
+    
+    return np.array([rank_index.get(v, -1) for v in values], dtype=int)
+
+
+class StatsEngine:
+    def __init__(self, stats_df, weapon_df, bond_df):
+        """ Precomputes per character stat arrays so final stats can be computed for many configurations at once
+
+        :param stats_df: the character stats table
+        :param weapon_df: the character UE table
+        :param bond_df: the character bond stats table, one row per bond level
+        """
+        # one row per character, the index has to be unique to look characters up
+        stats_df = stats_df.drop_duplicates(subset='CharacterId')
+        self.index = pd.Index(stats_df.CharacterId)
+        n = len(self.index)
+
+        # base stats at level 1 and 100, shape (characters, leveled stats)
+        self.base1 = stats_df[[s + '1' for s in leveled_stats]].to_numpy(dtype=float)
+        self.base100 = stats_df[[s + '100' for s in leveled_stats]].to_numpy(dtype=float)
+        # stats that don't scale with anything, passed through as they are
+        scaled_cols = [s + suffix for s in leveled_stats for suffix in ('1', '100')]
+        self.flat_cols = [c for c in stats_df.select_dtypes('number').columns if c not in scaled_cols + ['CharacterId', 'Id']]
+        self.flat = stats_df[self.flat_cols].reset_index(drop=True)
+
+        # star grade multipliers, shape (star grades, leveled stats), stats without a curve stay at 1
+        max_grade = max(max(curve) for curve in star_grade_multiplier_map.values())
+        self.star_mult = np.ones((max_grade + 1, len(leveled_stats)))
+        for stat, curve in star_grade_multiplier_map.items():
+            for grade, mult in curve.items():
+                self.star_mult[grade, leveled_stats.index(stat)] = mult
+
+        # UE stats at level 1 and 100, zero for characters without a UE
+        self.weapon1 = np.zeros((n, len(leveled_stats)))
+        self.weapon100 = np.zeros((n, len(leveled_stats)))
+        weapon_rows = self.index.get_indexer(weapon_df.CharacterId)
+        weapon_found = weapon_rows >= 0
+        for i, s in enumerate(leveled_stats):
+            if s in weapon_stats:
+                self.weapon1[weapon_rows[weapon_found], i] = weapon_df[s].to_numpy(dtype=float)[weapon_found]
+                self.weapon100[weapon_rows[weapon_found], i] = weapon_df[s + '100'].to_numpy(dtype=float)[weapon_found]
+
+        # cumulative bond stat bonuses, shape (characters, bond levels, leveled stats)
+        levels = bond_df.Level.to_numpy(dtype=int)
+        self.bond = np.zeros((n, levels.max() + 1 if len(levels) else 1, len(leveled_stats)))
+        bond_rows = self.index.get_indexer(bond_df.CharacterId)
+        bond_found = bond_rows >= 0
+        for stat_col, value_col in (('Stat1', 'Stat1Value'), ('Stat2', 'Stat2Value')):
+            stat_idx = bond_df[stat_col].map(bond_stat_column_map).map(leveled_stats.index).to_numpy()
+            np.add.at(self.bond, (bond_rows[bond_found], levels[bond_found], stat_idx[bond_found].astype(int)),
+                      bond_df[value_col].to_numpy(dtype=float)[bond_found])
+        # bonuses are cumulative so carry the last level forward for characters with fewer bond levels
+        self.bond = np.maximum.accumulate(self.bond, axis=1)
+
+        # terrain mood ranks, shape (characters, terrains)
+        self.terrains = list(terrain_affinity_map)
+        self.terrain_rank = np.stack([_adaptation_rank(stats_df[terrain_affinity_map[t]]) for t in self.terrains], axis=1)
+        self.rank_mult = np.array([adaptation_multiplier_map[rank] for rank in adaptation_ranks])
+        # terrain raised by the UE, -1 for characters without a UE
+        self.weapon_terrain = np.full(n, -1)
+        self.weapon_terrain[weapon_rows[weapon_found]] = pd.Index(self.terrains).get_indexer(weapon_df.TerrainBonus)[weapon_found]
+        self.weapon_tier_levels = np.array([weapon_tier_max_level[tier] for tier in sorted(weapon_tier_max_level)])
+
+    def compute(self, char_ids, level, star_grade, bond_level, ue_level, terrain):
+        """Computes final stats for every (character, configuration) pair, all arguments are equal length arrays
+
+        Leveled stats are interpolated linearly between level 1 and 100, scaled by the star grade multiplier of each stat,
+        then bond bonuses and UE stats (star grade 5 only) are added on top. From UE tier 3 (above UE level 40)
+        the UE terrain gets one mood rank better.
+
+        :param char_ids: character IDs
+        :param level: character levels, 1-100
+        :param star_grade: star grades, 1-5
+        :param bond_level: bond levels, starting at 1
+        :param ue_level: UE levels, 0 for no UE
+        :param terrain: terrain names, None to skip the terrain multiplier
+        :return DataFrame: one row of configuration and final stats per input pair, unknown characters are dropped
+        """
+        rows = self.index.get_indexer(char_ids)
+        found = rows >= 0
+        rows = rows[found]
+        level = np.clip(np.asarray(level)[found], 1, 100)
+        star_grade = np.clip(np.asarray(star_grade)[found], 1, self.star_mult.shape[0] - 1)
+        bond_level = np.clip(np.asarray(bond_level)[found], 1, self.bond.shape[1])
+        ue_level = np.clip(np.asarray(ue_level)[found], 0, 100)
+        terrain = np.asarray(terrain, dtype=object)[found]
+
+        # level interpolation
+        t = ((level - 1) / 99)[:, None]
+        stats = self.base1[rows] + (self.base100[rows] - self.base1[rows]) * t
+        # star grade
+        stats *= self.star_mult[star_grade]
+        # bond, level 1 is the first row
+        stats += self.bond[rows, bond_level - 1]
+        # UE, only available at 5 stars
+        has_weapon = ((ue_level > 0) & (star_grade >= 5))[:, None]
+        t_weapon = ((np.maximum(ue_level, 1) - 1) / 99)[:, None]
+        stats += np.where(has_weapon, self.weapon1[rows] + (self.weapon100[rows] - self.weapon1[rows]) * t_weapon, 0.0)
+
+        # terrain multiplier, the UE terrain is one rank better from the bonus tier on
+        terrain_idx = pd.Index(self.terrains).get_indexer(terrain)
+        rank = np.where(terrain_idx >= 0, self.terrain_rank[rows, np.maximum(terrain_idx, 0)], -1)
+        ue_tier = np.searchsorted(self.weapon_tier_levels, ue_level) + 1
+        upgraded = has_weapon[:, 0] & (ue_tier >= weapon_terrain_bonus_tier) & (self.weapon_terrain[rows] == terrain_idx) & (rank >= 0)
+        rank = np.where(upgraded, np.minimum(rank + 1, len(adaptation_ranks) - 1), rank)
+        terrain_mult = np.where(rank >= 0, self.rank_mult[np.maximum(rank, 0)], 1.0)
+
+        config_df = pd.DataFrame({
+            'CharacterId': self.index[rows],
+            'Level': level,
+            'StarGrade': star_grade,
+            'BondLevel': bond_level,
+            'WeaponLevel': ue_level,
+            'Terrain': terrain,
+        })
+        stats_df = pd.DataFrame(np.round(stats).astype(int), columns=leveled_stats)
+        flat_df = self.flat.iloc[rows].reset_index(drop=True)
+        result = pd.concat([config_df, stats_df, flat_df], axis=1)
+        result['TerrainAffinity'] = [adaptation_ranks[r] if r >= 0 else None for r in rank.tolist()]
+        result['TerrainMultiplier'] = terrain_mult
+
+        return result
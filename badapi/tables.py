@@ -0,0 +1,212 @@
+import sys
+from collections import OrderedDict, defaultdict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+
+def table_size(value, _seen=None):
+    """Estimates the memory held by a table in bytes, following the contents of containers and objects
+
+    Objects can report their own size with a memory_usage method.
+    """
+    # shared objects are only counted once
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        size = value.memory_usage(deep=True)
+        return int(size.sum()) if isinstance(size, pd.Series) else int(size)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) if value.base is None else value.nbytes
+    if callable(getattr(value, 'memory_usage', None)):
+        return int(value.memory_usage())
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(table_size(k, seen) + table_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(table_size(v, seen) for v in value)
+    elif hasattr(value, '__dict__'):
+        size += table_size(vars(value), seen)
+    elif hasattr(type(value), '__slots__'):
+        size += sum(table_size(getattr(value, slot), seen) for slot in type(value).__slots__ if hasattr(value, slot))
+
+    return size
+
+
+class TableManager:
+    def __init__(self, max_bytes=None, on_evict=None):
+        """ Keeps derived tables in memory under a budget, evicting the least recently used ones
+
+        :param max_bytes: total estimated size of all tables before eviction starts, None for no limit
+        :param on_evict: callable taking the name of every table that gets dropped
+        """
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        # one lock per table so concurrent requests don't build the same table twice
+        self._build_locks = defaultdict(Lock)
+
+    def get(self, name, build):
+        """Gets a table, building it if it isn't held
+
+        :param name: name of the table
+        :param build: callable that builds the table
+        :return: the table
+        """
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                return self._entries[name][0]
+            build_lock = self._build_locks[name]
+
+        with build_lock:
+            # another thread may have finished building while we waited
+            with self._lock:
+                if name in self._entries:
+                    self._entries.move_to_end(name)
+                    return self._entries[name][0]
+
+            # builds can depend on other tables, so don't hold the manager lock here
+            value = build()
+            size = table_size(value)
+
+            with self._lock:
+                self._entries[name] = (value, size)
+                self._size += size
+                evicted = self._evict(keep=name)
+            self._notify(evicted)
+
+        return value
+
+    def _evict(self, keep):
+        # drop cold tables until back under budget, never the one just built
+        evicted = []
+        if self.max_bytes is None:
+            return evicted
+        for name in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            _, size = self._entries.pop(name)
+            self._size -= size
+            evicted.append(name)
+
+        return evicted
+
+    def _notify(self, evicted):
+        # called outside the lock, the callback may take other locks
+        if self.on_evict is not None:
+            for name in evicted:
+                self.on_evict(name)
+
+    def evict(self, name):
+        """Drops a table so it gets rebuilt on next access"""
+        with self._lock:
+            if (entry := self._entries.pop(name, None)) is not None:
+                self._size -= entry[1]
+        if entry is not None:
+            self._notify([name])
+
+    def sizes(self):
+        """Gets the estimated size of every held table, from least to most recently used"""
+        with self._lock:
+            return {name: size for name, (_, size) in self._entries.items()}
+
+
+class SharedPool:
+    def __init__(self):
+        """ Derived tables shared between datasets, addressed by the content digests of the source tables they are built from
+
+        Every table is built once per distinct set of sources and held for as long as a dataset uses it.
+        """
+        self._entries = {}
+        # source tables each derived table was built from, learnt on its first build
+        self._dependencies = {}
+        self._lock = Lock()
+        self._build_locks = defaultdict(Lock)
+
+    def dependencies(self, name):
+        """Gets the source tables a derived table is built from
+
+        :param name: name of the table
+        :return frozenset: (region, source table name) pairs, None if the table hasn't been built yet
+        """
+        with self._lock:
+            return self._dependencies.get(name)
+
+    def set_dependencies(self, name, dependencies):
+        with self._lock:
+            self._dependencies[name] = frozenset(dependencies)
+
+    def acquire(self, key, build):
+        """Gets a shared table, building it if no dataset holds it yet
+
+        :param key: name of the table along with the digests of its sources
+        :param build: callable that builds the table
+        :return: the table, release it once it isn't used anymore
+        """
+        with self._lock:
+            build_lock = self._build_locks[key]
+
+        with build_lock:
+            with self._lock:
+                if (entry := self._entries.get(key)) is not None:
+                    entry[1] += 1
+                    return entry[0]
+
+            value = build()
+
+            with self._lock:
+                # the build lock may have been dropped and recreated meanwhile, keep whichever copy came first
+                entry = self._entries.setdefault(key, [value, 0])
+                entry[1] += 1
+
+        return entry[0]
+
+    def release(self, key):
+        """Stops using a shared table, it is dropped once no dataset uses it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._entries[key]
+                self._build_locks.pop(key, None)
+
+    def sizes(self):
+        """Gets the estimated size and number of users of every shared table"""
+        with self._lock:
+            entries = list(self._entries.items())
+
+        return {key: (table_size(value), refs) for key, (value, refs) in entries}
+
+
+class managed_table:
+    def __init__(self, func):
+        """ Replacement for functools.cached_property whose values are held by the owner's TableManager,
+        and shared with other datasets through the owner's SharedPool
+
+        :param func: method that builds the table
+        """
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        return instance._get_table(self.name, self.func)
@@ -0,0 +1,60 @@
+"""Measures how long importing badapi and creating the app take
+
+Neither should wait on the network or on loading the game data, which happens in the background.
+Each measurement runs in a fresh interpreter so nothing is already imported.
+
+    python benchmarks/startup.py [--repeat N] [--max-import SECONDS] [--max-create SECONDS]
+
+Exits with status 1 if the best time of either step is over its limit.
+"""
+import argparse
+import subprocess
+import sys
+
+# data roots that can't be reached, so the background load fails instead of hitting the network
+_unreachable_config = "{'root_jp': 'http://127.0.0.1:9/', 'root_global': 'http://127.0.0.1:9/'}"
+
+_import_code = """
+import time
+start = time.perf_counter()
+import badapi
+print(time.perf_counter() - start)
+"""
+
+_create_code = f"""
+import time
+import badapi
+start = time.perf_counter()
+app = badapi.create_app({_unreachable_config})
+print(time.perf_counter() - start)
+"""
+
+
+def best_time(code, repeat):
+    """Runs a snippet in fresh interpreters and returns the fastest time it printed"""
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-import', type=float, default=1.0, help='limit for importing badapi, in seconds')
+    parser.add_argument('--max-create', type=float, default=0.1, help='limit for create_app, in seconds')
+    args = parser.parse_args()
+
+    import_time = best_time(_import_code, args.repeat)
+    create_time = best_time(_create_code, args.repeat)
+    print(f'import badapi: {import_time * 1000:.1f} ms (limit {args.max_import * 1000:.0f} ms)')
+    print(f'create_app:    {create_time * 1000:.1f} ms (limit {args.max_create * 1000:.0f} ms)')
+
+    if import_time > args.max_import or create_time > args.max_create:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,10 @@ setup(
         'pandas',
         'requests',
     ],
+    entry_points={
+        'console_scripts': ['badapi=badapi.cli:main'],
+    },
+    extras_require={
+        'compression': ['brotli', 'zstandard'],
+    },
 )
\ No newline at end of file
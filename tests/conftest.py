@@ -0,0 +1,221 @@
+import hashlib
+import json
+
+import pytest
+
+from badapi.constants import *
+
+root_jp = 'http://jp.invalid/'
+root_global = 'http://global.invalid/'
+
+
+def row(keys, **values):
+    """A table row with every kept field, zero unless given"""
+    return {**dict.fromkeys(keys, 0), **values}
+
+
+def etc_text(key, en, jp):
+    return {'Key': key, 'NameJp': jp, 'DescriptionJp': jp + 'の説明', 'NameKr': '', 'DescriptionKr': ''}, \
+           {'Key': key, 'NameJp': jp, 'DescriptionJp': jp + 'の説明', 'NameEn': en, 'DescriptionEn': en + ' description',
+            'NameTh': '', 'DescriptionTh': '', 'NameTw': '', 'DescriptionTw': ''}
+
+
+def character(char_id, name, loc_id, playable=True, **values):
+    return row([k for k in info_keep_keys + details_keep_keys if k != 'BackupName'], **{'Id': char_id, 'DevName': name, 'LocalizeEtcId': loc_id,
+               'ProductionStep': 'Release', 'IsPlayableCharacter': playable, 'BulletType': 'Explosion', 'ArmorType': 'LightArmor',
+               'WeaponType': 'SR', 'School': 'Gehenna', 'Tags': ['Tag1', 'Tag2'], **values})
+
+
+def stats(char_id, hp, atk, heal, urban):
+    return {'CharacterId': char_id, 'MaxHP1': hp, 'MaxHP100': hp * 10, 'AttackPower1': atk, 'AttackPower100': atk * 10,
+            'DefensePower1': 10, 'DefensePower100': 100, 'HealPower1': heal, 'HealPower100': heal * 10,
+            'StreetBattleAdaptation': urban, 'OutdoorBattleAdaptation': 'B', 'IndoorBattleAdaptation': 'C',
+            'CriticalPoint': 100, 'StabilityPoint': 1500}
+
+
+def skill(group, skill_id, level, loc_id, material=0):
+    keys = [k for k in skill_keep_keys if k not in ('SkillCategory', 'MinimumGradeCharacterWeapon')]
+    return row(keys, GroupId=group, Id=skill_id, Level=level, LocalizeSkillId=loc_id, SkillCost=3, RequireLevelUpMaterial=material)
+
+
+def skill_text(key, en, jp_description):
+    return {'Key': key, 'NameJp': en, 'DescriptionJp': jp_description, 'NameKr': '', 'DescriptionKr': ''}, \
+           {'Key': key, 'NameJp': en, 'DescriptionJp': jp_description, 'NameEn': en, 'DescriptionEn': en + ' description',
+            'NameTh': '', 'DescriptionTh': '', 'NameTw': '', 'DescriptionTw': ''}
+
+
+def profile(char_id, name):
+    jp = {'CharacterId': char_id, 'BirthDay': '3/12'}
+    gl = {'CharacterId': char_id}
+    for key in profile_localize_keys:
+        jp[key + 'Jp'] = f'{name} {key} jp'
+        jp[key + 'Kr'] = ''
+        for lang in ('En', 'Th', 'Tw'):
+            gl[key + lang] = f'{name} {key} {lang.lower()}' if lang == 'En' else ''
+    return jp, gl
+
+
+def game_tables():
+    """A small but complete copy of every source table: two students, an NPC and a handful of assets and recipes
+
+    :return tuple: dictionaries of table name to rows, for the JP and global data roots
+    """
+    damage = '敵1人に攻撃力の[c][007eff]{}%[-][/c]分のダメージ'
+    passive = '攻撃力を[c][007eff]{}%[-][/c]増加/\n説明'
+    skills = []
+    skill_loc = []
+    for char_id, name in ((10000, 'Aru'), (10001, 'Shiroko')):
+        for n, (category, levels) in enumerate((('Ex', 3), ('Normal', 2), ('Passive', 2), ('Sub', 2), ('WeaponPassive', 2))):
+            group = f'{name}_{category}'
+            loc_id = char_id * 10 + n
+            for level in range(1, levels + 1):
+                # level 2 of every normal skill needs the skill book
+                skills.append(skill(group, loc_id * 10 + level, level, loc_id, material=50 if level == 2 else 0))
+            description = passive.format(10) if category == 'WeaponPassive' else damage.format(100 * (n + 1))
+            skill_loc.append(skill_text(loc_id, f'{name} {category}', description))
+
+    jp = {
+        'CharacterAcademyTagsExcelTable.json': [
+            {'Id': 10000, 'FavorItemUniqueTags': ['F_Aru_default']},
+            {'Id': 10001, 'FavorItemUniqueTags': ['F_Shiroko_default']},
+            {'Id': 90000, 'FavorItemUniqueTags': ['F_Npc_default']},
+        ],
+        'CharacterExcelTable.json': [
+            character(10000, 'Aru', 1000, SecretStoneItemId=102, CharacterPieceItemId=103),
+            character(10001, 'Shiroko', 1001, WeaponType='AR', School='Abydos', CharacterPieceItemId=103),
+            character(90000, 'Npc', 1002, playable=False, ProductionStep='Development'),
+        ],
+        'CharacterStatExcelTable.json': [
+            stats(10000, 100, 20, 10, 'A'),
+            stats(10001, 120, 25, 8, 'S'),
+            stats(90000, 50, 5, 1, 'D'),
+        ],
+        'CharacterWeaponExcelTable.json': [
+            {'Id': 10000, 'StatType': ['MaxHP_Base', 'AttackPower_Base', 'StreetBattleAdaptation_Base'],
+             'MaxHP': 100, 'MaxHP100': 1090, 'AttackPower': 10, 'AttackPower100': 109, 'HealPower': 0, 'HealPower100': 0,
+             'Unlock': [False, False, True], 'MaxLevel': [30, 40, 50], 'RecipeId': 3, 'ImagePath': 'aru_weapon'},
+            {'Id': 10001, 'StatType': ['MaxHP_Base', 'HealPower_Base', 'OutdoorBattleAdaptation_Base'],
+             'MaxHP': 200, 'MaxHP100': 2180, 'AttackPower': 0, 'AttackPower100': 0, 'HealPower': 5, 'HealPower100': 104,
+             'Unlock': [False, False, True], 'MaxLevel': [30, 40, 50], 'RecipeId': 0, 'ImagePath': 'shiroko_weapon'},
+        ],
+        'CharacterSkillListExcelTable.json': [
+            {'CharacterId': c_id, 'MinimumGradeCharacterWeapon': grade, 'IsFormConversion': False,
+             'ExSkillGroupId': [f'{name}_Ex'] if grade == 0 else [], 'PublicSkillGroupId': [f'{name}_Normal'] if grade == 0 else [],
+             'PassiveSkillGroupId': [f'{name}_Passive'] if grade == 0 else [f'{name}_WeaponPassive'],
+             'ExtraPassiveSkillGroupId': [f'{name}_Sub'] if grade == 0 else []}
+            for c_id, name in ((10000, 'Aru'), (10001, 'Shiroko')) for grade in (0, 2)
+        ],
+        'SkillExcelTable.json': skills,
+        'FavorLevelRewardExcelTable.json': [
+            {'CharacterId': c_id, 'FavorLevel': level, 'StatType': ['MaxHP_Base', 'AttackPower_Base'], 'StatValue': value}
+            for c_id in (10000, 10001) for level, value in ((2, [30, 5]), (3, [40, 6]))
+        ],
+        'CurrencyExcelTable.json': [
+            row(currency_keep_keys[1:], ID=1, LocalizeEtcId=2001, CurrencyType='Gold', Icon='gold', Rarity='N'),
+        ],
+        'ItemExcelTable.json': [
+            row(item_keep_keys, Id=100, LocalizeEtcId=2100, Rarity='SR', Icon='shield', ItemCategory='Material'),
+            row(item_keep_keys, Id=101, LocalizeEtcId=2101, Rarity='R', Icon='book', ItemCategory='Material'),
+            row(item_keep_keys, Id=102, LocalizeEtcId=2102, Rarity='SSR', Icon='eleph', ItemCategory='SecretStone'),
+            row(item_keep_keys, Id=103, LocalizeEtcId=2103, Rarity='SSR', Icon='piece', ItemCategory='CharacterPiece'),
+        ],
+        'EquipmentExcelTable.json': [
+            row(equipment_keep_keys[:14], Id=5001, LocalizeEtcId=2201, Rarity='R', Icon='hat', EquipmentCategory='Hat'),
+        ],
+        'EquipmentStatExcelTable.json': [
+            row(equipment_keep_keys[14:], EquipmentId=5001, StatType=['MaxHP_Base'], MinStat=[10], MaxStat=[100]),
+        ],
+        'FurnitureExcelTable.json': [
+            row(furniture_keep_keys, Id=7001, LocalizeEtcId=2301, Rarity='N', Icon='chair', Category='Furnitures'),
+        ],
+        'RecipeExcelTable.json': [
+            # crafts the hat from a currency cost and two ingredients
+            {'Id': 1, 'RecipeType': 'Craft', 'RecipeIngredientId': 10, 'ParcelType': ['Equipment'], 'ParcelId': [5001],
+             'ResultAmountMin': [1], 'ResultAmountMax': [1], 'CostTimeInSecond': 60},
+            # no cost, and parcels that aren't assets or don't exist
+            {'Id': 2, 'RecipeType': 'Craft', 'RecipeIngredientId': 20, 'ParcelType': ['Character'], 'ParcelId': [10000],
+             'ResultAmountMin': [1], 'ResultAmountMax': [1], 'CostTimeInSecond': 0},
+            # Aru's UE
+            {'Id': 3, 'RecipeType': 'CharacterWeapon', 'RecipeIngredientId': 30, 'ParcelType': [], 'ParcelId': [],
+             'ResultAmountMin': [], 'ResultAmountMax': [], 'CostTimeInSecond': 0},
+        ],
+        'RecipeIngredientExcelTable.json': [
+            {'Id': 10, 'CostParcelType': ['Currency'], 'CostId': [1], 'CostAmount': [500],
+             'IngredientParcelType': ['Item', 'Item'], 'IngredientId': [100, 101], 'IngredientAmount': [2, 3]},
+            {'Id': 20, 'CostParcelType': [], 'CostId': [], 'CostAmount': [],
+             'IngredientParcelType': ['Item'], 'IngredientId': [999], 'IngredientAmount': [1]},
+            {'Id': 30, 'CostParcelType': ['Currency'], 'CostId': [1], 'CostAmount': [1000],
+             'IngredientParcelType': ['Item'], 'IngredientId': [100], 'IngredientAmount': [4]},
+            # skill level up
+            {'Id': 50, 'CostParcelType': ['Currency'], 'CostId': [1], 'CostAmount': [10],
+             'IngredientParcelType': ['Item'], 'IngredientId': [101], 'IngredientAmount': [1]},
+        ],
+    }
+    gl = {}
+
+    etc = [etc_text(1000, 'Aru', 'アル'), etc_text(1001, 'Shiroko', 'シロコ'), etc_text(1002, 'Npc', 'モブ'),
+           etc_text(2001, 'Credit', 'クレジット'), etc_text(2100, 'Tactical Shield', '戦術の盾'),
+           etc_text(2101, 'Skill Book', '技術ノート'), etc_text(2102, 'Aru Eleph', 'アルの神秘解放の神名文字'),
+           etc_text(2103, 'Student Piece', '生徒のかけら'), etc_text(2201, 'Hat', '帽子'), etc_text(2301, 'Chair', '椅子')]
+    # a key only JP has yet, and one global still has
+    jp_only, _ = etc_text(3000, 'New Item', '新アイテム')
+    _, gl_only = etc_text(3001, 'Old Item', '旧アイテム')
+    jp['LocalizeEtcExcelTable.json'] = [e[0] for e in etc] + [jp_only]
+    gl['LocalizeEtcExcelTable.json'] = [e[1] for e in etc] + [gl_only]
+    jp['LocalizeSkillExcelTable.json'] = [s[0] for s in skill_loc]
+    gl['LocalizeSkillExcelTable.json'] = [s[1] for s in skill_loc]
+    profiles = [profile(10000, 'Aru'), profile(10001, 'Shiroko')]
+    jp['LocalizeCharProfileExcelTable.json'] = [p[0] for p in profiles]
+    gl['LocalizeCharProfileExcelTable.json'] = [p[1] for p in profiles]
+
+    return jp, gl
+
+
+def write_snapshot(path, jp=None, gl=None):
+    """Writes the game tables in the layout of a snapshot directory, so BAData can load them with from_snapshot
+
+    :param path: the snapshot directory
+    :param jp: tables replacing some of the default JP ones
+    :param gl: tables replacing some of the default global ones
+    """
+    default_jp, default_gl = game_tables()
+    for region, tables in (('jp', {**default_jp, **(jp or {})}), ('global', {**default_gl, **(gl or {})})):
+        for table_name, rows in tables.items():
+            raw = json.dumps({'DataList': rows}).encode()
+            digest = hashlib.sha1(raw).hexdigest()
+            snapshots = path / region / table_name
+            snapshots.mkdir(parents=True, exist_ok=True)
+            (snapshots / digest).write_bytes(raw)
+            (snapshots / 'latest').write_text(digest)
+
+    return path
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    return write_snapshot(tmp_path / 'snapshot')
+
+
+@pytest.fixture
+def bad(snapshot_dir):
+    from badapi.reader import BAData
+
+    return BAData(root_jp, root_global, snapshot_dir=snapshot_dir, from_snapshot=True)
+
+
+def make_loaded_app(snapshot_dir, **config):
+    """Creates an app serving the snapshot and waits for it to load"""
+    from badapi import create_app
+
+    app = create_app({'root_jp': root_jp, 'root_global': root_global, 'snapshot_dir': str(snapshot_dir),
+                      'load_from_snapshot': True, 'load_max_attempts': 1, **config})
+    registry = app.extensions['badapi']
+    registry.join(timeout=60)
+    assert registry.datasets[registry.default].ready, registry.datasets[registry.default].error
+
+    return app
+
+
+@pytest.fixture
+def app(snapshot_dir):
+    return make_loaded_app(snapshot_dir)
@@ -0,0 +1,100 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from badapi import create_app
+
+# nothing listens there, so every load attempt fails straight away
+unreachable = 'http://127.0.0.1:9/'
+
+
+def make_app(**config):
+    return create_app({'root_jp': unreachable, 'root_global': unreachable, 'load_retry_delay': 0.01, **config})
+
+
+def test_failed_load_is_retried_until_out_of_attempts():
+    app = make_app(load_max_attempts=3)
+    registry = app.extensions['badapi']
+
+    assert registry.join(timeout=30)
+    ready = app.test_client().get('/ready')
+    assert ready.status_code == 503
+    assert ready.json['Attempts'] == 3
+    assert not ready.json['Retrying']
+    assert ready.json['Error']
+
+
+@pytest.fixture
+def broken_source():
+    """A data source that answers 500 to every request, or stalls for a couple of seconds under /slow/"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/slow/'):
+                time.sleep(2)
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b'Internal Server Error')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+
+
+def test_error_pages_are_failed_attempts(broken_source):
+    app = create_app({'root_jp': broken_source, 'root_global': broken_source, 'load_retry_delay': 0.01, 'load_max_attempts': 2})
+
+    assert app.extensions['badapi'].join(timeout=30)
+    ready = app.test_client().get('/ready').json
+    assert ready['Attempts'] == 2
+    assert 'HTTPError' in ready['Error']
+
+
+def test_stalled_source_times_out(broken_source):
+    slow = broken_source + 'slow/'
+    app = create_app({'root_jp': slow, 'root_global': slow, 'fetch_timeout': 0.2, 'load_retry_delay': 0.01, 'load_max_attempts': 2})
+
+    assert app.extensions['badapi'].join(timeout=30)
+    ready = app.test_client().get('/ready').json
+    assert ready['Attempts'] == 2
+    assert 'Timeout' in ready['Error']
+
+
+def test_requests_wait_for_the_data():
+    app = make_app(load_max_attempts=1)
+    app.extensions['badapi'].join(timeout=30)
+
+    response = app.test_client().get('/characters/phonebook')
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+
+
+def test_unknown_dataset():
+    app = make_app(load_max_attempts=1)
+    app.extensions['badapi'].join(timeout=30)
+
+    assert app.test_client().get('/ready?dataset=nope').status_code == 404
+
+
+def test_matching_etag_is_not_modified(app):
+    client = app.test_client()
+    etag = client.get('/characters/phonebook').headers['ETag']
+
+    assert client.get('/characters/phonebook', headers={'If-None-Match': etag}).status_code == 304
+    full_dump = client.get('/assets/items/', headers={'If-None-Match': etag})
+    assert full_dump.status_code == 304
+    assert 'Accept-Encoding' in full_dump.headers['Vary']
+
+
+def test_unknown_urls_are_not_found_whatever_the_etag(app):
+    client = app.test_client()
+    etag = client.get('/characters/phonebook').headers['ETag']
+
+    assert client.get('/nonexistent', headers={'If-None-Match': etag}).status_code == 404
+    assert client.get('/assets/bogus/', headers={'If-None-Match': etag}).status_code == 404
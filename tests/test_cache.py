@@ -0,0 +1,144 @@
+import gzip
+import threading
+import time
+
+from werkzeug.datastructures import MultiDict
+
+from badapi.cache import ResponseCache, SingleFlight, cache_key
+
+
+def entry_size(entry):
+    return sum(map(len, entry.values()))
+
+
+def test_cache_key_ignores_parameter_order():
+    a = cache_key('/characters/', MultiDict([('WeaponType', 'SR'), ('WeaponType', 'AR'), ('lang', 'jp'), ('lang', 'en')]))
+    b = cache_key('/characters/', MultiDict([('lang', 'en'), ('WeaponType', 'AR'), ('lang', 'jp'), ('WeaponType', 'SR')]))
+
+    assert a == b
+
+
+def test_put_stores_every_coding():
+    cache = ResponseCache()
+    entry = cache.put('a', 'v1', b'{"a": 1}')
+
+    assert entry['identity'] == b'{"a": 1}'
+    assert gzip.decompress(entry['gzip']) == b'{"a": 1}'
+    assert cache.get('a', 'v1') == entry
+
+
+def test_least_recently_used_is_evicted_first():
+    size = entry_size(ResponseCache().put('x', 'v1', b'a' * 1000))
+    cache = ResponseCache(max_bytes=2 * size)
+    cache.put('a', 'v1', b'a' * 1000)
+    cache.put('b', 'v1', b'b' * 1000)
+    # touching a makes b the coldest entry
+    cache.get('a', 'v1')
+    cache.put('c', 'v1', b'c' * 1000)
+
+    assert cache.get('b', 'v1') is None
+    assert cache.get('a', 'v1') is not None
+    assert cache.get('c', 'v1') is not None
+
+
+def test_oversized_entry_is_not_cached_and_keeps_the_rest():
+    size = entry_size(ResponseCache().put('x', 'v1', b'a' * 1000))
+    cache = ResponseCache(max_bytes=2 * size)
+    cache.put('a', 'v1', b'a' * 1000)
+    entry = cache.put('big', 'v1', bytes(range(256)) * 100)
+
+    assert entry['identity'] == bytes(range(256)) * 100
+    assert cache.get('big', 'v1') is None
+    assert cache.get('a', 'v1') is not None
+
+
+def test_new_data_version_empties_the_cache():
+    cache = ResponseCache()
+    cache.put('a', 'v1', b'a')
+
+    assert cache.get('a', 'v2') is None
+    assert cache.get('a', 'v1') is None
+
+
+def run_concurrently(flight, key, func, n):
+    results = []
+    errors = []
+
+    def call():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    return results, errors
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return b'body'
+
+    leader = threading.Thread(target=flight.do, args=('k', slow))
+    leader.start()
+    started.wait(10)
+    # the leader is still running, so these join its flight
+    results = []
+    waiters = threading.Thread(target=lambda: results.extend(run_concurrently(flight, 'k', slow, 5)[0]))
+    waiters.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(10)
+    waiters.join(10)
+
+    assert calls == [1]
+    assert results == [b'body'] * 5
+
+
+def test_errors_are_raised_in_every_waiting_caller():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        raise ValueError('broken')
+
+    leader_errors = []
+    leader = threading.Thread(target=lambda: leader_errors.extend(run_concurrently(flight, 'k', failing, 1)[1]))
+    leader.start()
+    started.wait(10)
+    # the leader is still running, so these join its flight
+    waiter_errors = []
+    waiters = threading.Thread(target=lambda: waiter_errors.extend(run_concurrently(flight, 'k', failing, 4)[1]))
+    waiters.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join(10)
+    waiters.join(10)
+
+    assert calls == [1]
+    assert len(leader_errors) == 1 and len(waiter_errors) == 4
+    assert all(isinstance(err, ValueError) for err in leader_errors + waiter_errors)
+
+
+def test_later_calls_start_a_new_flight():
+    flight = SingleFlight()
+
+    assert flight.do('k', lambda: 1) == 1
+    assert flight.do('k', lambda: 2) == 2
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from badapi.changes import ChangeHistory, hash_rows
+
+from conftest import game_tables, make_loaded_app, write_snapshot
+
+
+def hashes(rows):
+    return {'items': hash_rows(pd.DataFrame(rows, columns=['Id', 'Name']), 'Id')}
+
+
+def test_changes_between_versions():
+    history = ChangeHistory()
+    history.record('v1', hashes([(1, 'a'), (2, 'b')]))
+    history.record('v2', hashes([(2, 'B'), (3, 'c')]))
+
+    assert history.changes('v1', 'v2') == {'items': {'Added': [3], 'Removed': [1], 'Modified': [2]}}
+
+
+def test_history_survives_restarts(tmp_path):
+    ChangeHistory(path=tmp_path).record('v1', hashes([(1, 'a')]))
+    history = ChangeHistory(path=tmp_path)
+    history.record('v2', hashes([(1, 'a')]))
+
+    assert history.changes('v1', 'v2') == {'items': {'Added': [], 'Removed': [], 'Modified': []}}
+
+
+def test_unknown_or_forgotten_versions():
+    history = ChangeHistory(max_versions=2)
+    for version in ('v1', 'v2', 'v3'):
+        history.record(version, hashes([(1, version)]))
+
+    assert history.changes('v1', 'v3') is None
+    assert history.changes('v0', 'v3') is None
+    assert history.changes('v2', 'v3') is not None
+
+
+def test_region_diff(bad):
+    diff = bad.region_diff
+
+    assert diff['LocalizeEtc'] == {'Added': [3000], 'Removed': [3001], 'Modified': []}
+    # the profile tables share no text columns, only their keys are compared
+    assert diff['LocalizeCharProfile'] == {'Added': [], 'Removed': []}
+
+
+def test_changes_route(tmp_path):
+    history_dir = tmp_path / 'history'
+    old_client = make_loaded_app(write_snapshot(tmp_path / 'old'), change_history_dir=str(history_dir)).test_client()
+    old_version = old_client.get('/changes').json['Version']
+    # the next patch renames an item, with the history kept across the restart
+    items = game_tables()[0]['ItemExcelTable.json']
+    items[0]['Icon'] = 'new_shield'
+    client = make_loaded_app(write_snapshot(tmp_path / 'new', jp={'ItemExcelTable.json': items}),
+                             change_history_dir=str(history_dir)).test_client()
+
+    changes = client.get(f'/changes?since={old_version}').json
+    assert changes['Since'] == old_version
+    assert changes['Version'] != old_version
+    assert changes['Changes']['items'] == {'Added': [], 'Removed': [], 'Modified': [100]}
+    assert changes['Changes']['characters'] == {'Added': [], 'Removed': [], 'Modified': []}
+    assert client.get('/changes?since=0123456789abcdef').status_code == 410
+    assert client.get('/changes?mode=regions').json['LocalizeEtc']['Added'] == [3000]
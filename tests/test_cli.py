@@ -0,0 +1,22 @@
+from badapi.cli import remove_stale, write_if_changed
+
+
+def test_write_if_changed_skips_identical_content(tmp_path):
+    path = tmp_path / 'en' / 'characters' / 'index.json'
+
+    assert write_if_changed(path, b'{}')
+    assert path.with_name('index.json.gz').exists()
+    assert not write_if_changed(path, b'{}')
+    assert write_if_changed(path, b'{"a": 1}')
+
+
+def test_remove_stale_keeps_exported_files_only(tmp_path):
+    for file_path in ['en/characters/1/index.json', 'en/characters/1/index.json.gz',
+                      'en/characters/2/index.json', 'en/characters/2/info.json.gz', 'en/notes.txt']:
+        (tmp_path / file_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / file_path).write_text('x')
+
+    assert remove_stale(tmp_path, ['en/characters/1/index.json']) == 2
+    assert (tmp_path / 'en/characters/1/index.json.gz').exists()
+    assert (tmp_path / 'en/notes.txt').exists()
+    assert not (tmp_path / 'en/characters/2').exists()
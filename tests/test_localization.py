@@ -0,0 +1,63 @@
+import pandas as pd
+
+from badapi.localization import LocalisationStore, Localization
+
+
+def make_store():
+    # Kr isn't held at all
+    return LocalisationStore({
+        'En': pd.DataFrame({'Name': ['Shield', 'Book'], 'Description': ['Blocks', 'Teaches']}, index=[1, 2]),
+        'Jp': pd.DataFrame({'Name': ['盾', '本'], 'Description': ['防ぐ', '教える']}, index=[1, 2]),
+    })
+
+
+def test_attach_adds_a_column_per_field_and_language():
+    df = pd.DataFrame({'Id': [10, 20, 30], 'LocalizeEtcId': [2, 1, 3]})
+    attached = make_store().attach(df, 'LocalizeEtcId', ['Name'], Localization('en', 'jp'))
+
+    assert attached.NameEn.tolist() == ['Book', 'Shield', '']
+    assert attached.NameJp.tolist() == ['本', '盾', '']
+    assert 'DescriptionEn' not in attached
+    # the table itself is left alone
+    assert list(df.columns) == ['Id', 'LocalizeEtcId']
+
+
+def test_attach_missing_language_is_empty():
+    df = pd.DataFrame({'LocalizeEtcId': [1, 2]})
+    attached = make_store().attach(df, 'LocalizeEtcId', ['Name', 'Description'], Localization('kr'))
+
+    assert attached.NameKr.tolist() == ['', '']
+    assert attached.DescriptionKr.tolist() == ['', '']
+
+
+def test_get_single_key():
+    store = make_store()
+
+    assert store.get(1, ['Name', 'Description'], Localization('en')) == {'NameEn': 'Shield', 'DescriptionEn': 'Blocks'}
+    assert store.get(3, ['Name'], Localization('en', 'jp')) == {'NameEn': '', 'NameJp': ''}
+    assert store.get(1, ['Name'], Localization('en', 'kr')) == {'NameEn': 'Shield', 'NameKr': ''}
+
+
+def test_split_column():
+    store = make_store()
+
+    assert store.split_column('NameEn') == ('Name', 'En')
+    assert store.split_column('DescriptionJp') == ('Description', 'Jp')
+    # languages and fields the store doesn't hold
+    assert store.split_column('NameKr') is None
+    assert store.split_column('TitleEn') is None
+    assert store.split_column('Id') is None
+
+
+def test_memory_usage_counts_every_language():
+    store = make_store()
+
+    assert store.memory_usage() > LocalisationStore({'En': store._tables['En']}).memory_usage()
+
+
+def test_lookup_by_localised_name(app):
+    client = app.test_client()
+
+    assert list(client.get('/characters/?NameEn=Shiroko').json) == ['10001']
+    assert list(client.get('/assets/items/?NameJp=戦術の盾&lang=jp').json) == ['100']
+    assert client.get('/characters/?NameKr=Shiroko').json == {}
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from badapi.ranking import StatRanking
+
+
+def make_ranking():
+    stats_df = pd.DataFrame({
+        'CharacterId': [1, 2, 3, 4, 4],
+        'Id': [11, 12, 13, 14, 14],
+        'MaxHP100': [300, 500, 500, 100, 100],
+        'Crit': [10, 40, 20, 30, 30],
+    })
+    weapon_df = pd.DataFrame({
+        'CharacterId': [1, 2],
+        'AttackPower100': [70, 90],
+        'RecipeId': [1000, 2000],
+        'TerrainBonus': ['Urban', 'Outdoor'],
+    })
+    return StatRanking(stats_df, weapon_df)
+
+
+def test_only_stats_are_ranked():
+    assert make_ranking().stats == ['MaxHP100', 'Crit', 'WeaponAttackPower100']
+
+
+def test_highest_first_with_ties_by_id():
+    assert make_ranking().rank('MaxHP100', top=3) == [(2, 500), (3, 500), (1, 300)]
+
+
+def test_ascending_walk():
+    ranking = make_ranking()
+
+    assert ranking.rank('Crit', ascending=True) == [(1, 10), (3, 20), (4, 30), (2, 40)]
+    assert ranking.rank('Crit', top=2, ascending=True) == [(1, 10), (3, 20)]
+
+
+def test_filtered_walk():
+    ranking = make_ranking()
+
+    assert ranking.rank('Crit', char_ids=[1, 4, 99]) == [(4, 30), (1, 10)]
+    assert ranking.rank('Crit', char_ids=[3, 4], ascending=True, top=1) == [(3, 20)]
+    assert ranking.rank('Crit', char_ids=[]) == []
+
+
+def test_characters_without_the_stat_are_left_out():
+    assert make_ranking().rank('WeaponAttackPower100', ascending=True) == [(1, 70), (2, 90)]
+
+
+def test_rank_route(app):
+    client = app.test_client()
+
+    ranked = client.get('/characters/rank?stat=MaxHP100&WeaponType=SR').json
+    assert [r['CharacterId'] for r in ranked] == [10000]
+    response = client.get('/characters/rank?stat=WeaponRecipeId')
+    assert response.status_code == 400
+    assert b'WeaponMaxHP100' in response.data and b'RecipeId' not in response.data
@@ -0,0 +1,28 @@
+import json
+
+import badapi.reader
+from badapi.reader import BAData
+
+from conftest import root_global, root_jp
+
+
+def test_workers_sharing_a_snapshot_directory_keep_their_own_bytes(tmp_path, monkeypatch):
+    upstream = {'value': 1}
+    monkeypatch.setattr(badapi.reader, '_fetch_game_data',
+                        lambda url, timeout=None: json.dumps({'DataList': [{'Id': 1, 'Value': upstream['value']}]}).encode())
+    old = BAData(root_jp, root_global, snapshot_dir=tmp_path)
+    old.data_version
+    # upstream changes and another worker fetches into the same directory
+    upstream['value'] = 2
+    new = BAData(root_jp, root_global, snapshot_dir=tmp_path)
+
+    assert new.data_version != old.data_version
+    assert old.items.Value.tolist() == [1]
+    assert new.items.Value.tolist() == [2]
+    assert not list(tmp_path.rglob('*.tmp'))
+    # a later start from the snapshot picks up the latest fetch
+    assert BAData(root_jp, root_global, snapshot_dir=tmp_path, from_snapshot=True).data_version == new.data_version
+
+
+def test_response_version_includes_the_api_version(bad):
+    assert bad.response_version.startswith(bad.data_version + '-')
@@ -0,0 +1,52 @@
+from badapi.localization import Localization
+
+
+def parcel(parcel_type, parcel_id, amount, rarity, icon, name):
+    return {'ParcelType': parcel_type, 'ParcelId': parcel_id, 'Amount': amount, 'Rarity': rarity, 'Icon': icon, 'NameEn': name}
+
+
+def test_parcels_are_expanded_one_row_per_parcel(bad):
+    parcels = bad.recipe_parcels.sort_values(['Id', 'Component', 'ParcelId'])
+
+    assert parcels[['Id', 'Component', 'ParcelType', 'ParcelId', 'Amount']].values.tolist() == [
+        [1, 'Cost', 'Currency', 1, 500],
+        [1, 'Ingredient', 'Item', 100, 2],
+        [1, 'Ingredient', 'Item', 101, 3],
+        [1, 'Yield', 'Equipment', 5001, 1],
+        [2, 'Ingredient', 'Item', 999, 1],
+        [2, 'Yield', 'Character', 10000, 1],
+        [3, 'Cost', 'Currency', 1, 1000],
+        [3, 'Ingredient', 'Item', 100, 4],
+    ]
+
+
+def test_recipe_with_several_ingredients(bad):
+    recipe = bad.get_recipe(['Id'], [[1]])[1]
+
+    assert recipe['Yield'] == [parcel('Equipment', 5001, 1, 'R', 'hat', 'Hat')]
+    assert recipe['Cost'] == [parcel('Currency', 1, 500, 'N', 'gold', 'Credit')]
+    assert recipe['Ingredient'] == [parcel('Item', 100, 2, 'SR', 'shield', 'Tactical Shield'),
+                                    parcel('Item', 101, 3, 'R', 'book', 'Skill Book')]
+    # the raw parcel lists are kept too
+    assert recipe['IngredientId'] == [100, 101]
+
+
+def test_empty_costs_and_unresolved_parcels(bad):
+    recipe = bad.get_recipe(['Id'], [[2]])[2]
+
+    assert recipe['Cost'] == []
+    # characters aren't assets and item 999 doesn't exist, both are kept without their entry
+    assert recipe['Yield'] == [parcel('Character', 10000, 1, '', '', '')]
+    assert recipe['Ingredient'] == [parcel('Item', 999, 1, '', '', '')]
+
+
+def test_recipe_without_yield(bad):
+    recipe = bad.get_recipe(['Id'], [[3]], lang=Localization('jp'))[3]
+
+    assert recipe['Yield'] == []
+    assert recipe['Ingredient'] == [{'ParcelType': 'Item', 'ParcelId': 100, 'Amount': 4, 'Rarity': 'SR', 'Icon': 'shield', 'NameJp': '戦術の盾'}]
+
+
+def test_every_recipe_and_unknown_ids(bad):
+    assert sorted(bad.get_recipe()) == [1, 2, 3]
+    assert bad.get_recipe(['Id'], [[42]]) == {}
@@ -0,0 +1,37 @@
+import pytest
+
+from badapi.constants import character_resources
+
+from conftest import make_loaded_app, write_snapshot
+
+urls = ['/characters/', '/characters/?student_only=false', '/characters/?lang=jp&lang=en', '/characters/10000/',
+        '/characters/90000/?lang=kr', '/characters/?WeaponType=AR', '/characters/?School=Gehenna&student_only=false',
+        '/characters/?NameEn=Aru', '/characters/10000/?WeaponType=AR', '/characters/10000/nonexistent'] + \
+       [f'/characters/{c_id}/{resource}' for c_id in (10000, 90000) for resource in character_resources]
+
+
+@pytest.fixture(scope='module')
+def clients(tmp_path_factory):
+    snapshot_dir = write_snapshot(tmp_path_factory.mktemp('snapshot'))
+    return {model: make_loaded_app(snapshot_dir, serving_model=model).test_client() for model in ('frames', 'records')}
+
+
+@pytest.mark.parametrize('url', urls)
+def test_records_match_frames(clients, url):
+    frames = clients['frames'].get(url)
+    records = clients['records'].get(url)
+
+    assert frames.status_code == records.status_code == 200
+    assert records.json == frames.json
+    # same key order too
+    assert records.data == frames.data
+
+
+def test_lookups_select_the_right_characters(clients):
+    client = clients['records']
+
+    assert list(client.get('/characters/').json) == ['10000', '10001']
+    assert list(client.get('/characters/?student_only=false').json) == ['10000', '10001', '90000']
+    assert list(client.get('/characters/?WeaponType=AR').json) == ['10001']
+    assert client.get('/characters/10000/?WeaponType=AR').json == {}
+    assert client.get('/characters/90000/weapon').json == {'90000': {}}
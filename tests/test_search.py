@@ -0,0 +1,38 @@
+import pandas as pd
+
+from badapi.localization import Localization
+from badapi.search import SearchIndex, tokenize
+
+
+def make_index():
+    items = pd.DataFrame({
+        'Id': [1, 2],
+        'NameEn': ['Tactical Shield', 'Attack Drink'],
+        'DescriptionEn': ['Blocks bullets', 'Raises attack'],
+        'NameJp': ['戦術の盾', '攻撃ドリンク'],
+        'DescriptionJp': ['弾を防ぐ', '攻撃力を上げる'],
+    })
+    return SearchIndex([('items', items)])
+
+
+def test_cjk_text_is_split_into_bigrams():
+    assert tokenize('攻撃力') == ['攻撃', '撃力']
+    assert tokenize('Attack 攻撃') == ['attack', '攻撃']
+
+
+def test_single_character_query_matches_longer_text():
+    results = make_index().search('盾', lang=Localization('jp'))
+
+    assert [r['Id'] for r in results] == [1]
+
+
+def test_multi_character_query_matches_bigrams():
+    results = make_index().search('攻撃', lang=Localization('jp'))
+
+    assert [r['Id'] for r in results] == [2]
+
+
+def test_latin_words_are_case_insensitive():
+    results = make_index().search('SHIELD')
+
+    assert [r['Id'] for r in results] == [1]
@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from badapi.stats import StatsEngine
+
+from conftest import make_loaded_app
+
+
+def make_engine():
+    stats_df = pd.DataFrame({
+        'CharacterId': [1, 2, 2],
+        'MaxHP1': [1000, 500, 500], 'MaxHP100': [10900, 5000, 5000],
+        'AttackPower1': [200, 100, 100], 'AttackPower100': [2180, 1000, 1000],
+        'DefensePower1': [50, 50, 50], 'DefensePower100': [50, 50, 50],
+        'HealPower1': [40, 20, 20], 'HealPower100': [436, 200, 200],
+        'UrbanAffinity': ['A', 'SS', 'SS'], 'OutdoorAffinity': ['S', 'B', 'B'], 'IndoorAffinity': ['B', 'D', 'D'],
+        'Crit': [100, 120, 120],
+    })
+    weapon_df = pd.DataFrame({
+        'CharacterId': [1, 2],
+        'MaxHP': [100, 0], 'MaxHP100': [1090, 0], 'AttackPower': [10, 0], 'AttackPower100': [109, 0],
+        'HealPower': [2, 0], 'HealPower100': [101, 0], 'TerrainBonus': ['Urban', 'Urban'],
+    })
+    bond_df = pd.DataFrame({
+        'CharacterId': [1, 1, 1], 'Level': [0, 1, 2],
+        'Stat1': ['Hp'] * 3, 'Stat1Value': [0, 30, 70], 'Stat2': ['Attack'] * 3, 'Stat2Value': [0, 5, 11],
+    })
+    return StatsEngine(stats_df, weapon_df, bond_df)
+
+
+def compute(char_id=1, level=1, star_grade=1, bond_level=1, ue_level=0, terrain=None):
+    return make_engine().compute([char_id], [level], [star_grade], [bond_level], [ue_level], [terrain]).iloc[0]
+
+
+def test_level_interpolation():
+    assert compute(level=100)[['MaxHP', 'AttackPower', 'HealPower']].tolist() == [10900, 2180, 436]
+    # 1000 + 9900 * 49 / 99
+    assert compute(level=50).MaxHP == 5900
+
+
+def test_every_stat_follows_its_star_grade_curve():
+    stats = compute(star_grade=5)
+
+    # 1000 * 1.35, 200 * 1.53, 40 * 1.445, defense has no curve
+    assert stats[['MaxHP', 'AttackPower', 'HealPower', 'DefensePower']].tolist() == [1350, 306, 58, 50]
+
+
+def test_bond_adds_the_bonuses_of_its_level():
+    # bond level 1 adds nothing, level 3 adds the third row
+    assert compute(bond_level=1).MaxHP == 1000
+    assert compute(bond_level=3)[['MaxHP', 'AttackPower']].tolist() == [1070, 211]
+
+
+def test_weapon_needs_five_stars():
+    # 1000 * 1.21 + 70, the UE level is ignored
+    assert compute(star_grade=4, bond_level=3, ue_level=45).MaxHP == 1280
+
+
+def test_full_configuration():
+    stats = compute(star_grade=5, bond_level=3, ue_level=45, terrain='Urban')
+
+    # UE at level 45 is 44/99 of the way to its level 100 stats: 100 + 440, 10 + 44, 2 + 44
+    assert stats.MaxHP == 1350 + 70 + 540
+    assert stats.AttackPower == 306 + 11 + 54
+    assert stats.HealPower == round(57.8 + 46)
+    # the UE terrain is one rank better from tier 3 on
+    assert stats.TerrainAffinity == 'S'
+    assert stats.TerrainMultiplier == 1.2
+
+
+def test_terrain_upgrade_needs_tier_three_and_the_ue_terrain():
+    assert compute(star_grade=5, ue_level=40, terrain='Urban').TerrainAffinity == 'A'
+    assert compute(star_grade=5, ue_level=41, terrain='Urban').TerrainAffinity == 'S'
+    assert compute(star_grade=4, ue_level=50, terrain='Urban').TerrainAffinity == 'A'
+    assert compute(star_grade=5, ue_level=50, terrain='Outdoor').TerrainAffinity == 'S'
+    # SS is the best rank
+    assert compute(char_id=2, star_grade=5, ue_level=50, terrain='Urban').TerrainAffinity == 'SS'
+    assert compute(terrain=None).TerrainMultiplier == 1.0
+
+
+def test_duplicate_and_unknown_characters():
+    computed = make_engine().compute([2, 3], [1, 1], [1, 1], [1, 1], [0, 0], [None, None])
+
+    assert computed.CharacterId.tolist() == [2]
+
+
+def test_combination_cap(bad, snapshot_dir):
+    with pytest.raises(ValueError):
+        bad.compute_stats([10000, 10001], level=[1, 2], max_combinations=3)
+    assert len(bad.compute_stats([10000], level=[1, 2], star_grade=[1, 5], max_combinations=4)[10000]) == 4
+
+    client = make_loaded_app(snapshot_dir, max_stat_combinations=3).test_client()
+    assert client.get('/characters/stats/computed?id=10000&id=10001&level=1&level=2').status_code == 400
+    assert client.get('/characters/stats/computed?id=10000&level=1&level=2').status_code == 200
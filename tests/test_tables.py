@@ -0,0 +1,102 @@
+import numpy as np
+
+from badapi.reader import BAData
+from badapi.tables import SharedPool, TableManager, table_size
+
+from conftest import game_tables, root_global, root_jp, write_snapshot
+
+
+class Holder:
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+
+def test_table_size_follows_contents():
+    array = np.zeros(10000)
+
+    assert table_size({'a': array}) > array.nbytes
+    assert table_size(Holder([array])) > array.nbytes
+    # the same array held twice is only counted once
+    assert table_size([array, array]) < 2 * array.nbytes
+
+
+def test_least_recently_used_table_is_evicted():
+    evicted = []
+    tables = TableManager(max_bytes=2 * table_size(np.zeros(1000)) + 1, on_evict=evicted.append)
+    tables.get('a', lambda: np.zeros(1000))
+    tables.get('b', lambda: np.zeros(1000))
+    tables.get('a', lambda: None)
+    tables.get('c', lambda: np.zeros(1000))
+
+    assert evicted == ['b']
+    assert list(tables.sizes()) == ['a', 'c']
+
+
+def test_shared_table_is_dropped_with_its_last_user():
+    pool = SharedPool()
+    built = []
+    first = pool.acquire(('items', 'a'), lambda: built.append(1) or ['items'])
+    second = pool.acquire(('items', 'a'), lambda: built.append(1) or ['other'])
+
+    assert first is second and built == [1]
+    pool.release(('items', 'a'))
+    assert ('items', 'a') in pool.sizes()
+    pool.release(('items', 'a'))
+    assert pool.sizes() == {}
+
+
+def make_datasets(tmp_path, **kwargs):
+    # the second dataset has a different item table and shares everything else
+    pool = SharedPool()
+    items = game_tables()[0]['ItemExcelTable.json']
+    items[0]['Icon'] = 'new_shield'
+    snapshots = {'a': write_snapshot(tmp_path / 'a'), 'b': write_snapshot(tmp_path / 'b', jp={'ItemExcelTable.json': items})}
+
+    return pool, *(BAData(root_jp, root_global, snapshot_dir=snapshots[name], from_snapshot=True, pool=pool, **kwargs)
+                   for name in ('a', 'b'))
+
+
+def test_datasets_share_tables_built_from_identical_sources(tmp_path):
+    pool, a, b = make_datasets(tmp_path)
+
+    assert a.character_details is b.character_details
+    assert a.skill_localisation is b.skill_localisation
+    assert a.items is not b.items
+    # derived from the items, so not shared either
+    assert a.parcel_index is not b.parcel_index
+    assert a.items.Icon.tolist()[0] == 'shield'
+    assert b.items.Icon.tolist()[0] == 'new_shield'
+
+
+def test_eviction_and_rebuild_keep_both_datasets_correct(tmp_path):
+    pool, a, b = make_datasets(tmp_path)
+    details = a.character_details
+    assert b.character_details is details
+
+    # the other dataset still holds it, so it comes straight back
+    a._tables.evict('character_details')
+    assert a.character_details is details
+    a._tables.evict('character_details')
+    b._tables.evict('character_details')
+    rebuilt = a.character_details
+    assert rebuilt is not details and rebuilt.equals(details)
+    assert b.character_details is rebuilt
+
+    a._tables.evict('items')
+    assert a.items.Icon.tolist()[0] == 'shield'
+    assert b.items.Icon.tolist()[0] == 'new_shield'
+
+
+def test_datasets_over_their_budget_stay_correct(tmp_path):
+    pool, a, b = make_datasets(tmp_path, max_table_bytes=1)
+    icons = lambda bad: bad.get_recipe(['Id'], [[3]])[3]['Ingredient'][0]['Icon']
+
+    # every build evicts the tables before it
+    for _ in range(2):
+        assert icons(a) == 'shield'
+        assert icons(b) == 'new_shield'
+    assert len(a._tables.sizes()) == 1
+    # evicted tables were released from the pool too
+    assert len(pool.sizes()) <= 2
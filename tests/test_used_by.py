@@ -0,0 +1,47 @@
+import pytest
+
+
+def test_recipes_and_weapons_using_an_item(bad):
+    used_by = bad.get_used_by('items', 100)
+
+    assert used_by['Recipes'] == [{'RecipeId': 1, 'Component': 'Ingredient', 'Amount': 2},
+                                  {'RecipeId': 3, 'Component': 'Ingredient', 'Amount': 4}]
+    # recipe 3 crafts Aru's UE
+    assert used_by['Weapons'] == [{'CharacterId': 10000, 'RecipeId': 3, 'Amount': 4}]
+    assert used_by['Characters'] == []
+
+
+def test_costs_are_recipes_too(bad):
+    used_by = bad.get_used_by('currencies', 1)
+
+    assert {'RecipeId': 1, 'Component': 'Cost', 'Amount': 500} in used_by['Recipes']
+    assert used_by['Weapons'] == [{'CharacterId': 10000, 'RecipeId': 3, 'Amount': 1000}]
+
+
+def test_characters_using_an_item(bad):
+    assert bad.get_used_by('items', 102)['Characters'] == [{'CharacterId': 10000, 'Field': 'SecretStoneItemId'}]
+    assert bad.get_used_by('items', 103)['Characters'] == [{'CharacterId': 10000, 'Field': 'CharacterPieceItemId'},
+                                                           {'CharacterId': 10001, 'Field': 'CharacterPieceItemId'}]
+
+
+def test_skills_using_an_item(bad):
+    skills = bad.get_used_by('items', 101)['Skills']
+
+    # level 2 of every skill needs the skill book
+    assert {(s['CharacterId'], s['Level'], s['Amount']) for s in skills} == {(10000, 2, 1), (10001, 2, 1)}
+    assert sorted(s['GroupId'] for s in skills if s['CharacterId'] == 10000) == \
+           ['Aru_Ex', 'Aru_Normal', 'Aru_Passive', 'Aru_Sub', 'Aru_WeaponPassive']
+
+
+def test_unused_assets_have_empty_lists(bad):
+    assert bad.get_used_by('furnitures', 7001) == {'Recipes': [], 'Characters': [], 'Weapons': [], 'Skills': []}
+    with pytest.raises(KeyError):
+        bad.get_used_by('skills', 1)
+
+
+def test_only_assets_have_a_used_by_route(app):
+    client = app.test_client()
+
+    assert client.get('/assets/items/100/used_by').json['Weapons'] == [{'CharacterId': 10000, 'RecipeId': 3, 'Amount': 4}]
+    assert client.get('/assets/skills/1/used_by').status_code == 404
+    assert client.get('/assets/recipes/1/used_by').status_code == 404